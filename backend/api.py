@@ -1,14 +1,52 @@
+from contextlib import asynccontextmanager
 from datetime import timezone
-from fastapi import FastAPI, Depends, HTTPException, Query
+from fastapi import FastAPI, Depends, HTTPException, Query, Request
 from sqlalchemy.orm import Session
-from sqlalchemy import select, func, or_, and_
+from sqlalchemy import select, func, or_, and_, case
 from fastapi.middleware.cors import CORSMiddleware
-from .db import Base, engine, get_db
-from .models import Game, GamePlayer, GamePlayerCard, Series, EloHistory
-from .config import PLAYER_TAGS, TOUCHDOWN_DRAFT_MODE_ID
+from starlette.concurrency import run_in_threadpool
+from .db import SessionLocal, get_db
+from .models import Game, GamePlayer, GamePlayerCard, Series, PairStat, DuoMatchup, Group, GroupMember, GameGroup, SeriesGroup, GroupDuoStat, Player
+from .migrations import init_db
+from .ratings import MODELS, model_accuracy, rating_timeline
+from .groups import DEFAULT_GROUP, member_tags
+from .form import PLAYER, DUO, duo_subject, load_form, form_summary, momentum_summary
+from .config import TOUCHDOWN_DRAFT_MODE_ID, COMPRESS_MIN_BYTES, FRONTEND_DIR, FORM_WINDOW, API_PREFIX
+from .web import FastJSONResponse, FastJSONRoute, CompressionMiddleware, PrefixMiddleware, StaticAsset, load_assets
+from .warm import cache as warm_cache, cached
 
+# Frontend files, hashed and precompressed once at startup
+_assets: dict[str, StaticAsset] = {}
 
-app = FastAPI(title="ClashRoyale Series Tracker API")
+# Schema checks and warm state run here rather than at import, so importing the
+# app (workers, scripts, tests) stays cheap and side-effect free.
+def _startup():
+    init_db()
+    _assets.clear()
+    _assets.update(load_assets(FRONTEND_DIR))
+    # endpoint results from the last snapshot, if it matches the data on disk
+    with SessionLocal() as db:
+        warm_cache.load(db)
+
+def _shutdown():
+    with SessionLocal() as db:
+        warm_cache.save(db)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # on the worker thread pool the sync endpoints use, which also starts it
+    await run_in_threadpool(_startup)
+    yield
+    await run_in_threadpool(_shutdown)
+
+
+app = FastAPI(
+    title="ClashRoyale Series Tracker API",
+    default_response_class=FastJSONResponse,
+    lifespan=lifespan,
+)
+# Endpoint results are rendered directly by FastJSONResponse (no jsonable_encoder pass)
+app.router.route_class = FastJSONRoute
 # Enable CORS
 app.add_middleware(
     CORSMiddleware,
@@ -16,39 +54,87 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
-
-Base.metadata.create_all(bind=engine)
+app.add_middleware(CompressionMiddleware, minimum_size=COMPRESS_MIN_BYTES)
+# The page served at / calls the API under /api; answer there too, no proxy needed
+app.add_middleware(PrefixMiddleware, prefix=API_PREFIX)
 
 # Basic health check endpoint
 @app.get("/health")
 def health():
     return {"ok": True}
 
-# Endpoint to get the timestamp of the last recorded battle
+# Resolve ?group=<slug> (roster-scoped endpoints); 404 for unknown groups
+def _group_id(db: Session, slug: str) -> int:
+    gid = db.scalar(select(Group.id).where(Group.slug == slug))
+    if gid is None:
+        raise HTTPException(status_code=404, detail=f"Unknown group {slug!r}")
+    return gid
+
+# Endpoint to list every tracked group with its member count
+@app.get("/groups")
+@cached
+def list_groups(db: Session = Depends(get_db)):
+    counts = dict(db.execute(
+        select(GroupMember.group_id, func.count()).group_by(GroupMember.group_id)
+    ).all())
+    return [
+        {"slug": g.slug, "name": g.name, "clan_tag": g.clan_tag, "members": counts.get(g.id, 0)}
+        for g in db.scalars(select(Group).order_by(Group.slug))
+    ]
+
+# Endpoint to get one group and its members
+@app.get("/groups/{slug}")
+@cached
+def group_detail(slug: str, db: Session = Depends(get_db)):
+    gid = _group_id(db, slug)
+    g = db.get(Group, gid)
+    members = db.execute(
+        select(GroupMember.player_tag, Player.name)
+        .join(Player, Player.tag == GroupMember.player_tag, isouter=True)
+        .where(GroupMember.group_id == gid)
+        .order_by(GroupMember.player_tag)
+    ).all()
+    return {
+        "slug": g.slug, "name": g.name, "clan_tag": g.clan_tag,
+        "members": [{"player_tag": t, "name": n} for t, n in members],
+    }
+
+# Endpoint to get the timestamp of the last recorded battle in a group
 @app.get("/last-update")
-def last_update(db: Session = Depends(get_db)):
-    q = select(func.max(Game.battle_time))
+@cached
+def last_update(group: str = Query(DEFAULT_GROUP), db: Session = Depends(get_db)):
+    gid = _group_id(db, group)
+    q = select(func.max(GameGroup.battle_time)).where(GameGroup.group_id == gid)
     return {"last_battle_time": db.scalar(q)}
 
-# Leaderboard endpoint: returns players sorted by number of wins
+# Leaderboard endpoint: returns a group's players sorted by number of wins
 @app.get("/leaderboard/series")
-def series_leaderboard(db: Session = Depends(get_db)):
-    wins = {}
-    for s in db.scalars(select(Series)):
-        winners = (s.teamA_tag1, s.teamA_tag2) if s.winner_team == 'A' else (s.teamB_tag1, s.teamB_tag2)
-        for tag in winners:
-            wins[tag] = wins.get(tag, 0) + 1
-    return sorted([{ 'player_tag': tag, 'series_wins': wins.get(tag, 0)} for tag in PLAYER_TAGS], key=lambda r: r['series_wins'], reverse=True)
-
-# Endpoint to get ELO history for a specific player
+@cached
+def series_leaderboard(group: str = Query(DEFAULT_GROUP), db: Session = Depends(get_db)):
+    gid = _group_id(db, group)
+    tags = member_tags(db, gid)
+    wins = {tag: 0 for tag in tags}
+    # the group's series, counted per pairing and winner
+    for w, a1, a2, b1, b2, n in db.execute(
+        select(Series.winner_team, Series.teamA_tag1, Series.teamA_tag2,
+               Series.teamB_tag1, Series.teamB_tag2, func.count())
+        .join(SeriesGroup, SeriesGroup.series_id == Series.id)
+        .where(SeriesGroup.group_id == gid)
+        .group_by(Series.winner_team, Series.teamA_tag1, Series.teamA_tag2, Series.teamB_tag1, Series.teamB_tag2)
+    ):
+        for tag in ((a1, a2) if w == 'A' else (b1, b2) if w == 'B' else ()):
+            if tag in wins:
+                wins[tag] += n
+    return sorted([{ 'player_tag': tag, 'series_wins': wins[tag]} for tag in tags], key=lambda r: r['series_wins'], reverse=True)
+
+# Endpoint to get rating history for a specific player (?model=elo|glicko2|trueskill)
 @app.get("/players/{tag}/elo-history")
-def elo_history(tag: str, db: Session = Depends(get_db)):
+@cached
+def elo_history(tag: str, model: str = Query("elo"), db: Session = Depends(get_db)):
     safe_tag = tag.strip().upper()
-    rows = db.execute(
-        select(EloHistory.timestamp, EloHistory.elo)
-        .where(EloHistory.player_tag == safe_tag)
-        .order_by(EloHistory.timestamp.asc(), EloHistory.id.asc())
-    ).all()
+    if model not in MODELS:
+        raise HTTPException(status_code=400, detail=f"model must be one of {sorted(MODELS)}")
+    rows = rating_timeline(db, model, safe_tag)
     history = []
     for ts, elo in rows:
         # your DB stores naive UTC; serialize as UTC with Z
@@ -57,56 +143,78 @@ def elo_history(tag: str, db: Session = Depends(get_db)):
         else:
             iso = ts.astimezone(timezone.utc).isoformat().replace("+00:00", "Z")
         history.append({"timestamp": iso, "elo": elo})
-    return {"player_tag": safe_tag, "history": history}
+    return {"player_tag": safe_tag, "model": model, "history": history}
 
-# Endpoint to get elixir leak statistics per player
+# Endpoint to compare the predictive accuracy of each rating model
+@app.get("/ratings/accuracy")
+@cached
+def ratings_accuracy(db: Session = Depends(get_db)):
+    return model_accuracy(db)
+
+# Endpoint to get elixir leak statistics per player, over a group's games
 @app.get("/stats/elixir")
-def elixir_stats(db: Session = Depends(get_db)):
+@cached
+def elixir_stats(group: str = Query(DEFAULT_GROUP), db: Session = Depends(get_db)):
+    gid = _group_id(db, group)
+    agg = {
+        tag: (count_, avg_)
+        for tag, count_, avg_ in db.execute(
+            select(GamePlayer.player_tag, func.count(), func.avg(GamePlayer.elixir_leaked))
+            .select_from(GameGroup)
+            .join(GamePlayer, GamePlayer.game_id == GameGroup.game_id)
+            .where(GameGroup.group_id == gid)
+            .group_by(GamePlayer.player_tag)
+        )
+    }
     results = []
-    for tag in PLAYER_TAGS:
-        q = select(func.count(), func.avg(GamePlayer.elixir_leaked)).where(GamePlayer.player_tag == tag)
-        count_, avg_ = db.execute(q).one()
+    for tag in member_tags(db, gid):
+        count_, avg_ = agg.get(tag, (0, None))
         results.append({'player_tag': tag, 'games': count_ or 0, 'avg_leaked': float(avg_ or 0.0)})
     return sorted(results, key=lambda r: r['avg_leaked'])
 
-# Endpoint to get card usage and win rates
+# Endpoint to get card usage and win rates over a group's games
 @app.get("/stats/cards")
-def card_stats(db: Session = Depends(get_db)):
-    from collections import defaultdict
-    winners = {g.id: g.winner_team for g in db.scalars(select(Game))}
-    uses, wins, losses = defaultdict(int), defaultdict(int), defaultdict(int)
-    gps = {(gp.game_id, gp.player_tag): gp for gp in db.scalars(select(GamePlayer))}
-
-    for c in db.scalars(select(GamePlayerCard)):
-        gp = gps.get((c.game_id, c.player_tag))
-        if not gp:
-            continue
-        wteam = winners.get(c.game_id)
-        if wteam == 'D':
-            continue
-        uses[c.card_id] += 1
-        if gp.team == wteam:
-            wins[c.card_id] += 1
-        else:
-            losses[c.card_id] += 1
-    
+@cached
+def card_stats(group: str = Query(DEFAULT_GROUP), db: Session = Depends(get_db)):
+    gid = _group_id(db, group)
+    # One aggregate over the group's games; draws are skipped
+    rows = db.execute(
+        select(
+            GamePlayerCard.card_id,
+            func.count(),
+            func.sum(case((GamePlayer.team == Game.winner_team, 1), else_=0)),
+        )
+        .join(
+            GamePlayer,
+            (GamePlayer.game_id == GamePlayerCard.game_id)
+            & (GamePlayer.player_tag == GamePlayerCard.player_tag),
+        )
+        .join(Game, Game.id == GamePlayerCard.game_id)
+        .join(GameGroup, GameGroup.game_id == GamePlayerCard.game_id)
+        .where(GameGroup.group_id == gid, Game.winner_team != 'D')
+        .group_by(GamePlayerCard.card_id)
+    ).all()
+
     data = []
-    for cid, u in uses.items():
-        w, l = wins.get(cid, 0), losses.get(cid, 0)
+    for cid, u, w in rows:
+        l = u - w
         win_pct = round(w / (w + l), 4) if (w + l) > 0 else 0.0
         data.append({'card_id': cid, 'uses': u, 'wins': w, 'losses': l, 'win_pct': win_pct})
-    
+
     return sorted(data, key=lambda x: (x['win_pct'], x['uses']), reverse=True)
 
-# Endpoint to get head-to-head stats between two cards
+# Endpoint to get head-to-head stats between two cards in a group's games
 @app.get("/stats/cards/head-to-head")
+@cached
 def card_head_to_head_games(
     card1: int = Query(..., ge=0),
     card2: int = Query(..., ge=0),
+    group: str = Query(DEFAULT_GROUP),
     db: Session = Depends(get_db),
 ):
     if card1 == card2:
         raise HTTPException(status_code=400, detail="card1 and card2 must be different")
+    gid = _group_id(db, group)
 
     # Pull all relevant rows in one query:
     #   game_id, game winner, team ('A'/'B'), and the card_id (only card1 or card2)
@@ -123,9 +231,11 @@ def card_head_to_head_games(
             (GamePlayerCard.game_id == GamePlayer.game_id)
             & (GamePlayerCard.player_tag == GamePlayer.player_tag),
         )
+        .join(GameGroup, GameGroup.game_id == Game.id)
         .where(
             Game.mode_id == TOUCHDOWN_DRAFT_MODE_ID,     # <-- remove this line if you want ALL modes
             GamePlayerCard.card_id.in_([card1, card2]),
+            GameGroup.group_id == gid,
         )
     ).all()
 
@@ -167,6 +277,7 @@ def card_head_to_head_games(
 
 # Endpoint to get a player's summary: top cards and most played-with teammate
 @app.get("/players/{tag}/summary")
+@cached
 def player_summary(tag: str, db: Session = Depends(get_db)):
     safe = tag.strip().upper()
 
@@ -223,44 +334,17 @@ def player_summary(tag: str, db: Session = Depends(get_db)):
         ) or 0)
     )
 
-    # ---- Top teammates (2) with series + games together (as before but returns a list) ----
-    gt = db.execute(
-        select(GamePlayer.game_id, GamePlayer.team)
-        .where(GamePlayer.player_tag == safe)
+    # ---- Top teammates (2) with series + games together, read from pair_stats ----
+    mates = db.execute(
+        select(PairStat.other_tag, PairStat.series, PairStat.games)
+        .where(PairStat.player_tag == safe, PairStat.relation == "with")
+        .order_by(PairStat.series.desc(), PairStat.games.desc())
+        .limit(2)
     ).all()
-    game_team = {gid: team for gid, team in gt}
-    games_with: dict[str, int] = {}
-    if game_team:
-        co_rows = db.execute(
-            select(GamePlayer.game_id, GamePlayer.player_tag, GamePlayer.team)
-            .where(GamePlayer.game_id.in_(list(game_team.keys())))
-        ).all()
-        for gid, ptag, pteam in co_rows:
-            if ptag == safe:
-                continue
-            if pteam == game_team.get(gid):
-                games_with[ptag] = games_with.get(ptag, 0) + 1
-
-    series_with: dict[str, int] = {}
-    for s in db.scalars(select(Series)).all():
-        sideA = {s.teamA_tag1, s.teamA_tag2}
-        sideB = {s.teamB_tag1, s.teamB_tag2}
-        if safe in sideA:
-            mate = (sideA - {safe}).pop()
-            series_with[mate] = series_with.get(mate, 0) + 1
-        elif safe in sideB:
-            mate = (sideB - {safe}).pop()
-            series_with[mate] = series_with.get(mate, 0) + 1
-
-    merged = []
-    for mate in set(games_with) | set(series_with):
-        merged.append({
-            "player_tag": mate,
-            "series_together": int(series_with.get(mate, 0)),
-            "games_together": int(games_with.get(mate, 0)),
-        })
-    merged.sort(key=lambda x: (x["series_together"], x["games_together"]), reverse=True)
-    top_teammates = merged[:2]
+    top_teammates = [
+        {"player_tag": mate, "series_together": int(s_), "games_together": int(g_)}
+        for mate, s_, g_ in mates
+    ]
 
     return {
         "player_tag": safe,
@@ -268,4 +352,158 @@ def player_summary(tag: str, db: Session = Depends(get_db)):
         "series_won": int(series_won),
         "top_cards": top_cards,
         "top_teammates": top_teammates,
-    }
\ No newline at end of file
+    }
+
+def _pct(wins: int, played: int) -> float:
+    return round(wins / played, 4) if played else 0.0
+
+# Rows of pair_stats for one player and relation ('with' | 'vs'), most series first
+def _pair_rows(db: Session, tag: str, relation: str):
+    return db.execute(
+        select(PairStat.other_tag, PairStat.games, PairStat.game_wins, PairStat.series, PairStat.series_wins)
+        .where(PairStat.player_tag == tag, PairStat.relation == relation)
+        .order_by(PairStat.series.desc(), PairStat.games.desc())
+    ).all()
+
+# Endpoint to get every teammate of a player with games/series together and win rates
+@app.get("/players/{tag}/teammates")
+@cached
+def player_teammates(tag: str, db: Session = Depends(get_db)):
+    safe = tag.strip().upper()
+    teammates = [
+        {
+            "player_tag": mate,
+            "games_together": g, "games_won": gw, "game_win_pct": _pct(gw, g),
+            "series_together": s_, "series_won": sw, "series_win_pct": _pct(sw, s_),
+        }
+        for mate, g, gw, s_, sw in _pair_rows(db, safe, "with")
+    ]
+    return {"player_tag": safe, "teammates": teammates}
+
+# Endpoint to get every opponent of a player with games/series against and wins
+@app.get("/players/{tag}/rivals")
+@cached
+def player_rivals(tag: str, db: Session = Depends(get_db)):
+    safe = tag.strip().upper()
+    rivals = [
+        {
+            "player_tag": rival,
+            "games_against": g, "games_won": gw, "game_win_pct": _pct(gw, g),
+            "series_against": s_, "series_won": sw, "series_win_pct": _pct(sw, s_),
+        }
+        for rival, g, gw, s_, sw in _pair_rows(db, safe, "vs")
+    ]
+    return {"player_tag": safe, "rivals": rivals}
+
+# Sort key for form rows: best recent win rate, then longest current win streak
+def _form_order(r: dict):
+    g = r["games"]
+    return (g["win_pct"], g["streak"] if g["streak_type"] == 'W' else -g["streak"])
+
+# Endpoint to get a player's recent form, streaks and Bo7 momentum, plus each duo they play in
+@app.get("/players/{tag}/form")
+@cached
+def player_form(tag: str, last: int = Query(10, ge=1, le=FORM_WINDOW), db: Session = Depends(get_db)):
+    safe = tag.strip().upper()
+    forms, moms = load_form(db, PLAYER, [safe])
+    mates = db.scalars(
+        select(PairStat.other_tag).where(PairStat.player_tag == safe, PairStat.relation == "with")
+    ).all()
+    subjects = {duo_subject(safe, m): m for m in mates}
+    duo_forms, duo_moms = load_form(db, DUO, list(subjects))
+    duos = [
+        {"teammate": mate, **form_summary(duo_forms[key], last), "momentum": momentum_summary(duo_moms.get(key))}
+        for key, mate in subjects.items() if key in duo_forms
+    ]
+    return {
+        "player_tag": safe,
+        "window": last,
+        **form_summary(forms.get(safe), last),
+        "momentum": momentum_summary(moms.get(safe)),
+        "duos": sorted(duos, key=_form_order, reverse=True),
+    }
+
+# Roster-wide form table: one row per group member, read by primary key
+@app.get("/form")
+@cached
+def group_form(
+    last: int = Query(10, ge=1, le=FORM_WINDOW),
+    group: str = Query(DEFAULT_GROUP),
+    db: Session = Depends(get_db),
+):
+    tags = member_tags(db, _group_id(db, group))
+    forms, moms = load_form(db, PLAYER, tags)
+    rows = [
+        {"player_tag": t, **form_summary(forms.get(t), last), "momentum": momentum_summary(moms.get(t))}
+        for t in tags
+    ]
+    return {"group": group, "window": last, "players": sorted(rows, key=_form_order, reverse=True)}
+
+# Duo leaderboard: every duo of a group's members sorted by series wins (each duo appears once),
+# counted over the group's own games and series (group_duo_stats; pair_stats are global, across groups)
+@app.get("/duos/leaderboard")
+@cached
+def duo_leaderboard(
+    min_series: int = Query(1, ge=0),
+    limit: int = Query(50, ge=1, le=500),
+    group: str = Query(DEFAULT_GROUP),
+    db: Session = Depends(get_db),
+):
+    gid = _group_id(db, group)
+    tags = set(member_tags(db, gid))
+    rows = []
+    for t1, t2, g, gw, s_, sw in db.execute(
+        select(GroupDuoStat.duo_tag1, GroupDuoStat.duo_tag2, GroupDuoStat.games, GroupDuoStat.game_wins,
+               GroupDuoStat.series, GroupDuoStat.series_wins)
+        .where(GroupDuoStat.group_id == gid, GroupDuoStat.series >= min_series)
+        .order_by(GroupDuoStat.series_wins.desc(), GroupDuoStat.series, GroupDuoStat.duo_tag1, GroupDuoStat.duo_tag2)
+    ):
+        if t1 in tags and t2 in tags:  # both still members
+            rows.append(((t1, t2), (g, gw, s_, sw)))
+            if len(rows) == limit:
+                break
+    return [
+        {
+            "players": [t1, t2],
+            "games": g, "games_won": gw, "game_win_pct": _pct(gw, g),
+            "series": s_, "series_won": sw, "series_win_pct": _pct(sw, s_),
+        }
+        for (t1, t2), (g, gw, s_, sw) in rows
+    ]
+
+# Endpoint to get how one duo has done against every other duo
+@app.get("/duos/{tag1}/{tag2}/matchups")
+@cached
+def duo_matchups(tag1: str, tag2: str, db: Session = Depends(get_db)):
+    d1, d2 = sorted([tag1.strip().upper(), tag2.strip().upper()])
+    if d1 == d2:
+        raise HTTPException(status_code=400, detail="tag1 and tag2 must be different")
+    rows = db.execute(
+        select(DuoMatchup.opp_tag1, DuoMatchup.opp_tag2, DuoMatchup.games, DuoMatchup.game_wins,
+               DuoMatchup.series, DuoMatchup.series_wins)
+        .where(DuoMatchup.duo_tag1 == d1, DuoMatchup.duo_tag2 == d2)
+        .order_by(DuoMatchup.series.desc(), DuoMatchup.games.desc())
+    ).all()
+    matchups = [
+        {
+            "opponents": [o1, o2],
+            "games": g, "games_won": gw, "game_win_pct": _pct(gw, g),
+            "series": s_, "series_won": sw, "series_win_pct": _pct(sw, s_),
+        }
+        for o1, o2, g, gw, s_, sw in rows
+    ]
+    return {"players": [d1, d2], "matchups": matchups}
+
+
+# ---- Static frontend (registered last so API routes take precedence) ----
+@app.get("/", include_in_schema=False)
+def frontend_index(request: Request):
+    return frontend_asset("index.html", request)
+
+@app.get("/{name}", include_in_schema=False)
+def frontend_asset(name: str, request: Request):
+    asset = _assets.get(name)
+    if asset is None:
+        raise HTTPException(status_code=404, detail="Not Found")
+    versioned = name != "index.html" and request.query_params.get("v") == asset.version
+    return asset.response(request.headers, versioned)
@@ -0,0 +1,203 @@
+from __future__ import annotations
+from datetime import datetime
+from pathlib import Path
+import json, struct, zlib
+from sqlalchemy import select, insert, func
+from sqlalchemy.orm import Session
+from .models import RawBattle
+from .config import ARCHIVE_DIR, ARCHIVE_SEGMENT_BYTES
+
+# Raw battle archive: every relevant battle payload is stored once (keyed by
+# game_uid), compressed, in append-only segment files under ARCHIVE_DIR. The
+# raw_battles table is the index (segment, offset, length, codec). Each record
+# also carries a small header so a segment can be scanned without the index.
+#
+# Records are appended when a battle is ingested, before the ingest transaction
+# commits (the index row needs the offset). If that transaction rolls back, or
+# the process dies before the commit, the record stays in the segment with no
+# index row: an orphan. It is harmless (reads only go through raw_battles, and
+# the battle is appended again when it is next fetched); `scripts/archive.py
+# reindex` reports orphans and only indexes them with --adopt.
+#
+# Codecs: zstd with a trained dictionary when `zstandard` is installed and a
+# dictionary has been trained, plain zstd otherwise, zlib as the fallback.
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - optional dependency
+    zstandard = None
+
+CODEC_ZLIB = 0
+CODEC_ZSTD = 1
+CODEC_ZSTD_DICT = 2
+
+MAGIC = b"CRB1"
+HEADER = struct.Struct("<4s32sBHI")  # magic, uid (sha256 bytes), codec, dict number, payload length
+
+ZSTD_LEVEL = 12
+DICT_SIZE = 110 * 1024
+
+
+def encode_battle(b: dict) -> bytes:
+    """Canonical JSON bytes for a battle (sorted keys, no whitespace)."""
+    return json.dumps(b, sort_keys=True, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+class Archive:
+    """Segment files plus the zstd dictionaries that live next to them."""
+
+    def __init__(self, directory: str | Path = ARCHIVE_DIR, segment_bytes: int = ARCHIVE_SEGMENT_BYTES):
+        self.dir = Path(directory)
+        self.segment_bytes = segment_bytes
+        self._dicts: dict[int, object] = {}
+        self._decompressors: dict[int, object] = {}
+
+    # ---- dictionaries ----
+    def _dict_path(self, n: int) -> Path:
+        return self.dir / f"dict-{n:04d}.zdict"
+
+    def latest_dict(self) -> int:
+        """Number of the newest trained dictionary (0 = none)."""
+        nums = [int(p.stem.split("-")[1]) for p in self.dir.glob("dict-*.zdict")]
+        return max(nums, default=0)
+
+    def _dict(self, n: int):
+        d = self._dicts.get(n)
+        if d is None:
+            d = self._dicts[n] = zstandard.ZstdCompressionDict(self._dict_path(n).read_bytes())
+        return d
+
+    def train_dictionary(self, samples: list[bytes]) -> int:
+        """Train a new zstd dictionary from sample payloads; returns its number."""
+        if zstandard is None:
+            raise RuntimeError("zstandard is not installed")
+        self.dir.mkdir(parents=True, exist_ok=True)
+        d = zstandard.train_dictionary(DICT_SIZE, samples)
+        n = self.latest_dict() + 1
+        self._dict_path(n).write_bytes(d.as_bytes())
+        self._dicts[n] = d
+        return n
+
+    # ---- codecs ----
+    def compress(self, raw: bytes) -> tuple[int, int, bytes]:
+        if zstandard is None:
+            return CODEC_ZLIB, 0, zlib.compress(raw, 9)
+        n = self.latest_dict()
+        if n:
+            c = zstandard.ZstdCompressor(level=ZSTD_LEVEL, dict_data=self._dict(n))
+            return CODEC_ZSTD_DICT, n, c.compress(raw)
+        return CODEC_ZSTD, 0, zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(raw)
+
+    def decompress(self, codec: int, dict_no: int, data: bytes) -> bytes:
+        if codec == CODEC_ZLIB:
+            return zlib.decompress(data)
+        if zstandard is None:
+            raise RuntimeError("zstandard is required to read zstd-compressed archive records")
+        key = dict_no if codec == CODEC_ZSTD_DICT else 0
+        d = self._decompressors.get(key)
+        if d is None:
+            d = zstandard.ZstdDecompressor(dict_data=self._dict(dict_no)) if key else zstandard.ZstdDecompressor()
+            self._decompressors[key] = d
+        return d.decompress(data)
+
+    # ---- segments ----
+    def _segment_path(self, n: int) -> Path:
+        return self.dir / f"seg-{n:06d}.bin"
+
+    def _current_segment(self) -> int:
+        nums = [int(p.stem.split("-")[1]) for p in self.dir.glob("seg-*.bin")]
+        n = max(nums, default=1)
+        path = self._segment_path(n)
+        if path.exists() and path.stat().st_size >= self.segment_bytes:
+            n += 1
+        return n
+
+    def append(self, uid: str, raw: bytes) -> dict:
+        """Compress and append one record; returns its index fields."""
+        self.dir.mkdir(parents=True, exist_ok=True)
+        codec, dict_no, data = self.compress(raw)
+        seg = self._current_segment()
+        with open(self._segment_path(seg), "ab") as f:
+            start = f.tell()
+            f.write(HEADER.pack(MAGIC, bytes.fromhex(uid), codec, dict_no, len(data)))
+            f.write(data)
+        return {"segment": seg, "offset": start + HEADER.size, "length": len(data),
+                "codec": codec, "dict_no": dict_no}
+
+    def read(self, segment: int, offset: int, length: int, codec: int, dict_no: int) -> dict:
+        with open(self._segment_path(segment), "rb") as f:
+            f.seek(offset)
+            data = f.read(length)
+        return json.loads(self.decompress(codec, dict_no, data))
+
+    def scan_segment(self, segment: int):
+        """Yield (uid, index fields) for every record in a segment, from the headers alone."""
+        with open(self._segment_path(segment), "rb") as f:
+            while True:
+                head = f.read(HEADER.size)
+                if len(head) < HEADER.size:
+                    return
+                magic, uid, codec, dict_no, length = HEADER.unpack(head)
+                if magic != MAGIC:
+                    raise ValueError(f"corrupt archive segment {segment} at {f.tell() - HEADER.size}")
+                offset = f.tell()
+                f.seek(length, 1)
+                yield uid.hex(), {"segment": segment, "offset": offset, "length": length,
+                                  "codec": codec, "dict_no": dict_no}
+
+
+_default: Archive | None = None
+
+def get_archive() -> Archive:
+    global _default
+    if _default is None:
+        _default = Archive()
+    return _default
+
+
+def archive_battle(db: Session, uid: str, battle_time: datetime, b: dict) -> bool:
+    """
+    Store a battle payload once. The same battle shows up in all four
+    participants' logs; later copies only cost an indexed lookup.
+    Returns True if it was newly archived.
+    """
+    if db.execute(select(RawBattle.uid).where(RawBattle.uid == uid)).first():
+        return False
+    rec = get_archive().append(uid, encode_battle(b))
+    db.execute(insert(RawBattle).values(uid=uid, battle_time=battle_time, **rec))
+    return True
+
+def iter_battles(db: Session, since: datetime | None = None, batch: int = 1000):
+    """Stream archived battle dicts back in battle_time order."""
+    arc = get_archive()
+    q = select(RawBattle.segment, RawBattle.offset, RawBattle.length, RawBattle.codec, RawBattle.dict_no)
+    if since is not None:
+        q = q.where(RawBattle.battle_time >= since)
+    q = q.order_by(RawBattle.battle_time.asc(), RawBattle.uid.asc()).execution_options(yield_per=batch)
+    for seg, off, length, codec, dict_no in db.execute(q):
+        yield arc.read(seg, off, length, codec, dict_no)
+
+def train_from_archive(db: Session, max_samples: int = 2000) -> int:
+    """Train a zstd dictionary from the most recent archived payloads."""
+    arc = get_archive()
+    rows = db.execute(
+        select(RawBattle.segment, RawBattle.offset, RawBattle.length, RawBattle.codec, RawBattle.dict_no)
+        .order_by(RawBattle.battle_time.desc())
+        .limit(max_samples)
+    ).all()
+    samples = [encode_battle(arc.read(*r)) for r in rows]
+    return arc.train_dictionary(samples)
+
+def archive_stats(db: Session) -> dict:
+    count, stored = db.execute(select(func.count(), func.coalesce(func.sum(RawBattle.length), 0))).one()
+    by_codec = dict(db.execute(select(RawBattle.codec, func.count()).group_by(RawBattle.codec)).all())
+    arc = get_archive()
+    files = sorted(arc.dir.glob("seg-*.bin"))
+    return {
+        "battles": count,
+        "compressed_bytes": int(stored),
+        "segments": len(files),
+        "segment_bytes": sum(p.stat().st_size for p in files),
+        "by_codec": by_codec,
+        "dictionary": arc.latest_dict(),
+    }
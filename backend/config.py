@@ -1,4 +1,5 @@
 from dotenv import load_dotenv
+from pathlib import Path
 import os
 
 # Load environment variables from a .env file if present
@@ -17,8 +18,34 @@ CLAN_TAG = os.getenv("CLAN_TAG","").strip() or None
 
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./cr_series.db")
 
+# Concurrent battle-log requests per sync (each tag is fetched once, whatever its groups)
+FETCH_WORKERS = int(os.getenv("FETCH_WORKERS", "8"))
+
 SESSION_MAX_GAP_MINUTES = int(os.getenv("SESSION_MAX_GAP_MINUTES", "30"))
 
+# Recent results kept per player/duo for the form endpoints
+FORM_WINDOW = int(os.getenv("FORM_WINDOW", "20"))
+
+# Responses at least this large are gzip/brotli compressed by the API
+COMPRESS_MIN_BYTES = int(os.getenv("COMPRESS_MIN_BYTES", "1024"))
+
+# Append-only compressed archive of raw battle payloads (see archive.py)
+ARCHIVE_DIR = os.getenv("ARCHIVE_DIR", "./archive")
+ARCHIVE_SEGMENT_BYTES = int(os.getenv("ARCHIVE_SEGMENT_BYTES", str(64 * 1024 * 1024)))
+
+# Snapshot of the API's cached endpoint results, written by the sync and loaded
+# by each API worker at start (empty disables it)
+WARM_SNAPSHOT = os.getenv("WARM_SNAPSHOT", "./warm_state.json")
+# How often a worker re-reads the data version (seconds), and its cache size
+VERSION_CHECK_SECONDS = float(os.getenv("VERSION_CHECK_SECONDS", "1.0"))
+WARM_CACHE_MAX = int(os.getenv("WARM_CACHE_MAX", "5000"))
+
+# Path prefix the API is also served under (the frontend calls API_BASE = "/api")
+API_PREFIX = os.getenv("API_PREFIX", "/api")
+
+# Directory of the static frontend served (precompressed) by the API
+FRONTEND_DIR = os.getenv("FRONTEND_DIR", str(Path(__file__).resolve().parent.parent / "frontend"))
+
 # Constants for Clash Royale API
 TOUCHDOWN_DRAFT_MODE_ID = 72000051
 TWO_VS_TWO_TYPES = {"clanMate2v2"}
\ No newline at end of file
@@ -0,0 +1,58 @@
+from __future__ import annotations
+from sqlalchemy import and_, bindparam, insert, or_, select, update
+from sqlalchemy.orm import Session
+
+# Additive counter rows (pair_stats, duo_matchups, momentum_stats): rows are
+# keyed by their primary key and only ever incremented.
+
+
+def bump(db: Session, model, key: dict, inc: dict[str, int]):
+    """Add `inc` to the row with primary key `key`, inserting it on first sight (other counters at their default 0)."""
+    res = db.execute(
+        update(model)
+        .where(*[getattr(model, k) == v for k, v in key.items()])
+        .values({k: getattr(model, k) + v for k, v in inc.items()})
+    )
+    if res.rowcount == 0:
+        db.execute(insert(model).values(**key, **inc))
+
+def bump_many(db: Session, model, totals: dict[tuple, dict[str, int]], chunk: int = 100) -> int:
+    """
+    Add increments to many rows at once. `totals` maps tuple(key.items()) (the
+    primary key columns) to {counter: increment}. Existing keys are looked up in
+    chunks, then updated with one executemany UPDATE and the rest inserted with
+    one executemany INSERT. Returns the number of rows touched.
+    """
+    if not totals:
+        return 0
+    table = model.__table__
+    keys = list(totals)
+    names = [k for k, _ in keys[0]]
+    cols = [table.c[n] for n in names]
+    fields = sorted({f for inc in totals.values() for f in inc})
+
+    existing: set[tuple] = set()
+    for i in range(0, len(keys), chunk):
+        # OR of full-key equalities: one primary key probe each (SQLite never
+        # uses an index for a multi-column `(a, b) IN (VALUES ...)`)
+        part = or_(*[and_(*[table.c[n] == v for n, v in k]) for k in keys[i:i + chunk]])
+        existing.update(tuple(r) for r in db.execute(select(*cols).where(part)))
+
+    updates, inserts = [], []
+    for k in keys:
+        inc = totals[k]
+        values = tuple(v for _, v in k)
+        if values in existing:
+            updates.append({**{f"k_{n}": v for n, v in k}, **{f"i_{f}": inc.get(f, 0) for f in fields}})
+        else:
+            inserts.append({**dict(k), **{f: inc.get(f, 0) for f in fields}})
+    if updates:
+        db.execute(
+            update(table)
+            .where(*[table.c[n] == bindparam(f"k_{n}") for n in names])
+            .values({f: table.c[f] + bindparam(f"i_{f}") for f in fields}),
+            updates,
+        )
+    if inserts:
+        db.execute(insert(table), inserts)
+    return len(keys)
@@ -1,14 +1,31 @@
+from __future__ import annotations
+import threading
 import requests
-from .config import CR_TOKEN
-
-if not CR_TOKEN:
-    raise ValueError("Missing CR_TOKEN in environment or config.")
+from requests.adapters import HTTPAdapter
+from .config import CR_TOKEN, FETCH_WORKERS
 
 BASE = "https://api.clashroyale.com/v1"
-HEADERS = {
-    "Authorization": f"Bearer {CR_TOKEN}",
-    "Accept": "application/json",
-}
+
+# One pooled session shared by the sync's fetch threads (keep-alive to the API).
+# Built on first use, so importing this module never needs CR_TOKEN.
+_session: requests.Session | None = None
+_session_lock = threading.Lock()
+
+def _get_session() -> requests.Session:
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                if not CR_TOKEN:
+                    raise ValueError("Missing CR_TOKEN in environment or config.")
+                s = requests.Session()
+                s.headers.update({
+                    "Authorization": f"Bearer {CR_TOKEN}",
+                    "Accept": "application/json",
+                })
+                s.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=max(FETCH_WORKERS, 1)))
+                _session = s
+    return _session
 
 """
 Fetch the (25?) most recent battles for a given player tag.
@@ -18,9 +35,10 @@ Returns: list of battle dictionaries (JSON-decoded).
 def player_battlelog(tag: str):
     # tag must be URL-encoded (# -> %23) when used in URL
     safe_tag = tag.replace("#", "%23")
+    session = _get_session()
     try:
         url = f"{BASE}/players/{safe_tag}/battlelog"
-        r = requests.get(url, headers=HEADERS, timeout=20)
+        r = session.get(url, timeout=20)
         r.raise_for_status()
         return r.json()
     except requests.exceptions.HTTPError as e:
@@ -0,0 +1,310 @@
+from __future__ import annotations
+from collections import defaultdict
+import json
+from sqlalchemy import select, insert, delete, func, tuple_
+from sqlalchemy.orm import Session
+from .models import Game, Series, FormState, MomentumStat, FormMeta
+from .config import FORM_WINDOW
+from .ratings import series_rows
+from .counters import bump, bump_many
+from .warm import bump_generation
+
+# Recent form, streaks and intra-series momentum per player and per duo.
+#
+# form_state holds a fixed-size window of recent results (a string used as a
+# ring buffer) and current/longest streaks. Streaks depend on order, so they
+# are folded in chronologically behind a watermark by update_form(), like the
+# rating engine. momentum_stats are plain counters from each completed Bo7
+# (comebacks, blown leads, deciders, win rate after a win/loss), recorded by
+# series detection as it walks the Bo7, so they are order-independent.
+
+PLAYER = "player"
+DUO = "duo"
+
+MOMENTUM_FIELDS = (
+    "series", "series_wins", "game1_wins", "game1_conversions", "led", "blown_leads",
+    "trailed", "comebacks", "trailed_0_3", "comebacks_0_3", "deciders", "decider_wins",
+    "after_win", "after_win_wins", "after_loss", "after_loss_wins",
+)
+
+def duo_subject(t1: str, t2: str) -> str:
+    return "+".join(sorted((t1, t2)))
+
+# Yield (kind, subject, side) for the four players and two duos of one result
+def _subjects(teamA: tuple[str, str], teamB: tuple[str, str]):
+    for team, side in ((teamA, 'A'), (teamB, 'B')):
+        for tag in team:
+            yield PLAYER, tag, side
+        yield DUO, duo_subject(*team), side
+
+
+# ---- momentum (per Bo7) ----
+
+def bo7_momentum(winners: list[str], winner: str) -> dict[str, dict[str, int]]:
+    """
+    Counters for sides 'A' and 'B' from one completed Bo7, given its game winners
+    in order ('A' | 'B' | 'D'; draws are ignored) and the series winner.
+    """
+    out = {s: dict.fromkeys(MOMENTUM_FIELDS, 0) for s in "AB"}
+    score = {'A': 0, 'B': 0}
+    trailed = {'A': False, 'B': False}
+    down_0_3 = {'A': False, 'B': False}
+    decider = False
+    first = prev = None
+    for w in winners:
+        if w not in ('A', 'B'):
+            continue
+        if prev is not None:
+            for s in "AB":
+                key = "after_win" if prev == s else "after_loss"
+                out[s][key] += 1
+                out[s][key + "_wins"] += int(w == s)
+        first = first or w
+        score[w] += 1
+        if score[w] == 4:
+            break  # the clincher; leads and deficits only count before it
+        for s, o in (('A', 'B'), ('B', 'A')):
+            if score[s] < score[o]:
+                trailed[s] = True
+                if score[s] == 0 and score[o] == 3:
+                    down_0_3[s] = True
+        if score['A'] == 3 and score['B'] == 3:
+            decider = True
+        prev = w
+
+    for s, o in (('A', 'B'), ('B', 'A')):
+        won = winner == s
+        c = out[s]
+        c["series"] = 1
+        c["series_wins"] = int(won)
+        c["game1_wins"] = int(first == s)
+        c["game1_conversions"] = int(first == s and won)
+        c["led"] = int(trailed[o])
+        c["blown_leads"] = int(trailed[o] and not won)
+        c["trailed"] = int(trailed[s])
+        c["comebacks"] = int(trailed[s] and won)
+        c["trailed_0_3"] = int(down_0_3[s])
+        c["comebacks_0_3"] = int(down_0_3[s] and won)
+        c["deciders"] = int(decider)
+        c["decider_wins"] = int(decider and won)
+    return out
+
+def record_momentum(db: Session, teamA: tuple[str, str], teamB: tuple[str, str], winners: list[str], winner: str):
+    """Count one finished Bo7 for its four players and two duos."""
+    sides = bo7_momentum(winners, winner)
+    for kind, subject, side in _subjects(teamA, teamB):
+        bump(db, MomentumStat, {"kind": kind, "subject": subject}, sides[side])
+
+def record_momentum_many(db: Session, results: list[tuple[tuple[str, str], tuple[str, str], list[str], str]]) -> int:
+    """
+    record_momentum() for many (teamA, teamB, game winners, winner) Bo7s at once,
+    summed in memory and written with executemany. Returns rows touched.
+    """
+    totals: dict = defaultdict(lambda: dict.fromkeys(MOMENTUM_FIELDS, 0))
+    for teamA, teamB, winners, winner in results:
+        sides = bo7_momentum(winners, winner)
+        for kind, subject, side in _subjects(teamA, teamB):
+            row = totals[(("kind", kind), ("subject", subject))]
+            for k, v in sides[side].items():
+                row[k] += v
+    return bump_many(db, MomentumStat, totals)
+
+
+# ---- form windows and streaks (chronological) ----
+
+def _new_state() -> dict:
+    return {
+        "games_recent": "", "games_streak": 0, "games_best_streak": 0, "games_worst_streak": 0,
+        "series_recent": "", "series_streak": 0, "series_best_streak": 0, "series_worst_streak": 0,
+        "last_game_at": None,
+    }
+
+def _push(st: dict, prefix: str, r: str):
+    """Append one result ('W' | 'L' | 'D') to the window and update the streaks."""
+    st[f"{prefix}_recent"] = (st[f"{prefix}_recent"] + r)[-FORM_WINDOW:]
+    s = st[f"{prefix}_streak"]
+    if r == 'W':
+        s = s + 1 if s > 0 else 1
+    elif r == 'L':
+        s = s - 1 if s < 0 else -1
+    else:
+        s = 0
+    st[f"{prefix}_streak"] = s
+    st[f"{prefix}_best_streak"] = max(st[f"{prefix}_best_streak"], s)
+    st[f"{prefix}_worst_streak"] = max(st[f"{prefix}_worst_streak"], -s)
+
+def _fold(states: dict, prefix: str, teamA, teamB, winner: str, at=None):
+    for kind, subject, side in _subjects(teamA, teamB):
+        st = states.get((kind, subject))
+        if st is None:
+            st = states[(kind, subject)] = _new_state()
+        _push(st, prefix, 'D' if winner not in ('A', 'B') else 'W' if winner == side else 'L')
+        if at is not None:
+            st["last_game_at"] = at
+
+_GAME_ORDER = (Game.battle_time.asc(), Game.id.asc())
+
+def _game_rows(db: Session, after: tuple | None = None):
+    q = select(
+        Game.id, Game.battle_time, Game.winner_team,
+        Game.teamA_tag1, Game.teamA_tag2, Game.teamB_tag1, Game.teamB_tag2,
+    ).order_by(*_GAME_ORDER)
+    if after is not None:
+        q = q.where(tuple_(Game.battle_time, Game.id) > tuple_(*after))
+    return db.execute(q.execution_options(yield_per=5000))
+
+def _save_meta(db: Session, games_count: int, game_key, series_count: int, series_key):
+    g_at, g_id = game_key or (None, None)
+    s_end, s_start, s_id = series_key or (None, None, None)
+    db.merge(FormMeta(
+        id=1, games_count=games_count, last_game_at=g_at, last_game_id=g_id,
+        series_count=series_count, last_ended_at=s_end, last_started_at=s_start, last_series_id=s_id,
+    ))
+
+def _write_states(db: Session, states: dict, replace: bool):
+    if replace:
+        for kind in (PLAYER, DUO):
+            subjects = [s for k, s in states if k == kind]
+            if subjects:
+                db.execute(delete(FormState).where(FormState.kind == kind, FormState.subject.in_(subjects)))
+    if states:
+        db.execute(insert(FormState), [{"kind": k, "subject": s, **st} for (k, s), st in states.items()])
+
+def rebuild_form(db: Session) -> int:
+    """
+    Recompute form_state and momentum_stats from all Games and Series in one
+    chronological pass. Returns the number of form rows written.
+    """
+    db.execute(delete(FormState))
+    db.execute(delete(MomentumStat))
+    db.execute(delete(FormMeta))
+
+    states: dict = {}
+    winners: dict[str, str] = {}
+    games_count, game_key = 0, None
+    for gid, bt, w, a1, a2, b1, b2 in _game_rows(db):
+        _fold(states, "games", (a1, a2), (b1, b2), w, at=bt)
+        winners[gid] = w
+        games_count += 1
+        game_key = (bt, gid)
+
+    momentum = defaultdict(lambda: dict.fromkeys(MOMENTUM_FIELDS, 0))
+    series_count, series_key = 0, None
+    game_ids = dict(db.execute(select(Series.id, Series.game_ids)).all())
+    for sid, started, ended, w, a1, a2, b1, b2 in series_rows(db):
+        _fold(states, "series", (a1, a2), (b1, b2), w)
+        sides = bo7_momentum([winners.get(g, 'D') for g in json.loads(game_ids[sid])], w)
+        for kind, subject, side in _subjects((a1, a2), (b1, b2)):
+            row = momentum[(kind, subject)]
+            for k, v in sides[side].items():
+                row[k] += v
+        series_count += 1
+        series_key = (ended, started, sid)
+
+    _write_states(db, states, replace=False)
+    if momentum:
+        db.execute(insert(MomentumStat), [{"kind": k, "subject": s, **c} for (k, s), c in momentum.items()])
+    _save_meta(db, games_count, game_key, series_count, series_key)
+    bump_generation(db)
+    db.commit()
+    return len(states)
+
+def update_form(db: Session) -> int:
+    """
+    Fold games and series that sort after the watermarks into the touched
+    players' and duos' windows. Falls back to rebuild_form() when there is no
+    saved state or something was inserted into the past (e.g. a late battle).
+    Returns the number of form rows written.
+    """
+    meta = db.get(FormMeta, 1)
+    if meta is None:
+        return rebuild_form(db)
+    game_key = (meta.last_game_at, meta.last_game_id) if meta.last_game_at else None
+    series_key = (meta.last_ended_at, meta.last_started_at, meta.last_series_id) if meta.last_ended_at else None
+
+    games_before = db.scalar(
+        select(func.count()).select_from(Game).where(tuple_(Game.battle_time, Game.id) <= tuple_(*game_key))
+    ) if game_key else 0
+    series_before = db.scalar(
+        select(func.count()).select_from(Series)
+        .where(tuple_(Series.ended_at, Series.started_at, Series.id) <= tuple_(*series_key))
+    ) if series_key else 0
+    if games_before != meta.games_count or series_before != meta.series_count:
+        return rebuild_form(db)
+
+    games = _game_rows(db, after=game_key).all()
+    series = series_rows(db, after=series_key)
+    if not games and not series:
+        return 0
+
+    touched = {(k, s) for r in games for k, s, _ in _subjects(r[3:5], r[5:7])}
+    touched |= {(k, s) for r in series for k, s, _ in _subjects(r[4:6], r[6:8])}
+    states: dict = {}
+    for kind in (PLAYER, DUO):
+        subjects = [s for k, s in touched if k == kind]
+        if subjects:
+            for row in db.scalars(select(FormState).where(FormState.kind == kind, FormState.subject.in_(subjects))):
+                states[(kind, row.subject)] = {k: getattr(row, k) for k in _new_state()}
+
+    for gid, bt, w, a1, a2, b1, b2 in games:
+        _fold(states, "games", (a1, a2), (b1, b2), w, at=bt)
+    for sid, started, ended, w, a1, a2, b1, b2 in series:
+        _fold(states, "series", (a1, a2), (b1, b2), w)
+
+    _write_states(db, states, replace=True)
+    _save_meta(
+        db,
+        meta.games_count + len(games), (games[-1][1], games[-1][0]) if games else game_key,
+        meta.series_count + len(series), (series[-1][2], series[-1][1], series[-1][0]) if series else series_key,
+    )
+    db.commit()
+    return len(states)
+
+
+# ---- read side ----
+
+def window_summary(recent: str, streak: int, best: int, worst: int, last: int) -> dict:
+    """Last-`last` results plus streaks, shaped for the API."""
+    window = recent[-last:]
+    w, l, d = window.count('W'), window.count('L'), window.count('D')
+    return {
+        "recent": window,
+        "wins": w, "losses": l, "draws": d,
+        "win_pct": round(w / (w + l), 4) if (w + l) else 0.0,
+        "streak": abs(streak),
+        "streak_type": 'W' if streak > 0 else 'L' if streak < 0 else None,
+        "longest_win_streak": best,
+        "longest_loss_streak": worst,
+    }
+
+def form_summary(st: FormState | None, last: int) -> dict:
+    st = st or FormState(**_new_state())
+    return {
+        "games": window_summary(st.games_recent, st.games_streak, st.games_best_streak, st.games_worst_streak, last),
+        "series": window_summary(st.series_recent, st.series_streak, st.series_best_streak, st.series_worst_streak, last),
+        "last_game_at": st.last_game_at,
+    }
+
+def momentum_summary(m: MomentumStat | None) -> dict:
+    c = {f: getattr(m, f) if m is not None else 0 for f in MOMENTUM_FIELDS}
+    rate = lambda a, b: round(c[a] / c[b], 4) if c[b] else 0.0
+    return {
+        **c,
+        "game1_conversion_rate": rate("game1_conversions", "game1_wins"),
+        "comeback_rate": rate("comebacks", "trailed"),
+        "comeback_rate_0_3": rate("comebacks_0_3", "trailed_0_3"),
+        "blown_lead_rate": rate("blown_leads", "led"),
+        "decider_win_rate": rate("decider_wins", "deciders"),
+        "win_rate_after_win": rate("after_win_wins", "after_win"),
+        "win_rate_after_loss": rate("after_loss_wins", "after_loss"),
+    }
+
+def load_form(db: Session, kind: str, subjects: list[str]) -> tuple[dict, dict]:
+    """({subject: FormState}, {subject: MomentumStat}) for the given subjects, by primary key."""
+    if not subjects:
+        return {}, {}
+    forms = {r.subject: r for r in db.scalars(
+        select(FormState).where(FormState.kind == kind, FormState.subject.in_(subjects)))}
+    moms = {r.subject: r for r in db.scalars(
+        select(MomentumStat).where(MomentumStat.kind == kind, MomentumStat.subject.in_(subjects)))}
+    return forms, moms
@@ -0,0 +1,237 @@
+from __future__ import annotations
+from collections import defaultdict
+from datetime import datetime
+from sqlalchemy import select, insert, delete, func, and_
+from sqlalchemy.orm import Session
+from .models import Game, Series, Player, Group, GroupMember, GameGroup, SeriesGroup, GroupDuoStat
+from .counters import bump_many
+from .warm import bump_generation
+from .config import PLAYER_TAGS, PLAYER_NAMES, CLAN_TAG
+
+# Rosters as data. A battle belongs to every group that has all four
+# participants as members (and, for a group with a clan_tag, all four in that
+# clan). Games and series are stored once and linked to their groups through
+# game_groups / series_groups; group-scoped endpoints start from those links.
+# Linking also bumps the group's duo totals (group_duo_stats), so the duo
+# leaderboard reads one small table instead of aggregating the group's history.
+#
+# The group configured through PLAYER_TAGS / CLAN_TAG in the environment is
+# kept in sync as the "default" group, which is what endpoints use when no
+# ?group= is given.
+
+DEFAULT_GROUP = "default"
+
+
+class Roster:
+    """
+    In-memory inverted index tag -> group ids, loaded once per sync. Classifying
+    a battle is one set intersection per participant, however many groups exist.
+    """
+
+    def __init__(self, clans: dict[int, str | None], members: list[tuple[int, str]]):
+        self.clans = clans  # group id -> required clan tag (None = any clan)
+        by_tag: dict[str, set[int]] = {}
+        for gid, tag in members:
+            by_tag.setdefault(tag, set()).add(gid)
+        self.by_tag = {tag: frozenset(gids) for tag, gids in by_tag.items()}
+
+    def tags(self) -> list[str]:
+        """Every tag that is a member of at least one group, once."""
+        return sorted(self.by_tag)
+
+    def classify(self, b: dict) -> set[int]:
+        """Ids of every group this battle qualifies for (empty if none)."""
+        players = b.get("team", []) + b.get("opponent", [])
+        groups: set[int] | None = None
+        for p in players:
+            gids = self.by_tag.get(p["tag"].strip().upper())
+            if not gids:
+                return set()  # an outsider to every group
+            groups = set(gids) if groups is None else groups & gids
+            if not groups:
+                return set()
+        clans = {(p.get("clan") or {}).get("tag") for p in players}
+        return {g for g in groups or () if self.clans.get(g) is None or clans == {self.clans[g]}}
+
+def load_roster(db: Session) -> Roster:
+    clans = dict(db.execute(select(Group.id, Group.clan_tag)).all())
+    members = db.execute(select(GroupMember.group_id, GroupMember.player_tag)).all()
+    return Roster(clans, members)
+
+
+# ---- links ----
+
+def _duo_totals():
+    return defaultdict(lambda: defaultdict(int))
+
+# Count one game or series (count_col: "games" | "series") for both duos in a group
+def _add_duos(totals, group_id: int, teams: tuple, winner: str, count_col: str, n: int = 1):
+    a1, a2, b1, b2 = teams
+    wins_col = "game_wins" if count_col == "games" else "series_wins"
+    for (t1, t2), side in (((a1, a2), "A"), ((b1, b2), "B")):
+        t1, t2 = sorted((t1, t2))
+        row = totals[(("group_id", group_id), ("duo_tag1", t1), ("duo_tag2", t2))]
+        row[count_col] += n
+        row[wins_col] += n if winner == side else 0
+
+def link_game(db: Session, game: Game, group_ids: set[int], new: bool = False) -> int:
+    """
+    Attach a game (a Game or a row with its id, battle_time, teams and
+    winner_team) to groups it is not linked to yet (new=True: just inserted,
+    none yet); returns rows added.
+    """
+    have = set() if new else set(db.scalars(select(GameGroup.group_id).where(GameGroup.game_id == game.id)))
+    rows = [{"group_id": g, "game_id": game.id, "battle_time": game.battle_time}
+            for g in sorted(group_ids - have)]
+    if rows:
+        db.execute(insert(GameGroup), rows)
+        totals = _duo_totals()
+        teams = (game.teamA_tag1, game.teamA_tag2, game.teamB_tag1, game.teamB_tag2)
+        for r in rows:
+            _add_duos(totals, r["group_id"], teams, game.winner_team, "games")
+        bump_many(db, GroupDuoStat, totals)
+        if not new:
+            bump_generation(db)  # an old game joined a group; the latest game did not move
+    return len(rows)
+
+def link_series(db: Session, series: list[tuple[str, str, tuple, str]], chunk: int = 500) -> int:
+    """
+    Link new series to the groups of their first game. series is
+    [(series_id, first_game_id, (a1, a2, b1, b2), winner)].
+    """
+    firsts = sorted({s[1] for s in series})
+    groups_of: dict[str, list[int]] = {}
+    for i in range(0, len(firsts), chunk):
+        for gid, grp in db.execute(
+            select(GameGroup.game_id, GameGroup.group_id).where(GameGroup.game_id.in_(firsts[i:i + chunk]))
+        ):
+            groups_of.setdefault(gid, []).append(grp)
+    rows, totals = [], _duo_totals()
+    for sid, first, teams, winner in series:
+        for grp in groups_of.get(first, ()):
+            rows.append({"group_id": grp, "series_id": sid})
+            _add_duos(totals, grp, teams, winner, "series")
+    if rows:
+        db.execute(insert(SeriesGroup), rows)
+        bump_many(db, GroupDuoStat, totals)
+    return len(rows)
+
+def rebuild_group_duos(db: Session) -> int:
+    """Recompute group_duo_stats from the stored links. Returns rows written."""
+    db.execute(delete(GroupDuoStat))
+    totals = _duo_totals()
+    for model, link, count_col in ((Game, GameGroup, "games"), (Series, SeriesGroup, "series")):
+        link_id = link.game_id if link is GameGroup else link.series_id
+        teams = (model.teamA_tag1, model.teamA_tag2, model.teamB_tag1, model.teamB_tag2)
+        for grp, w, a1, a2, b1, b2, n in db.execute(
+            select(link.group_id, model.winner_team, *teams, func.count())
+            .join(model, model.id == link_id)
+            .group_by(link.group_id, model.winner_team, *teams)
+        ):
+            _add_duos(totals, grp, (a1, a2, b1, b2), w, count_col, n)
+    n = bump_many(db, GroupDuoStat, totals)
+    bump_generation(db)
+    db.commit()
+    return n
+
+
+# ---- management ----
+
+def get_group(db: Session, slug: str) -> Group | None:
+    return db.scalar(select(Group).where(Group.slug == slug))
+
+def member_tags(db: Session, group_id: int) -> list[str]:
+    return list(db.scalars(
+        select(GroupMember.player_tag).where(GroupMember.group_id == group_id).order_by(GroupMember.player_tag)
+    ))
+
+def create_group(db: Session, slug: str, name: str | None = None, clan_tag: str | None = None) -> Group:
+    g = Group(slug=slug, name=name or slug, clan_tag=clan_tag or None, created_at=datetime.utcnow())
+    db.add(g)
+    db.flush()
+    return g
+
+def set_members(db: Session, group: Group, players: dict[str, str | None], replace: bool = False) -> tuple[int, int]:
+    """
+    Add players ({tag: name or None}) to a group, creating missing Player rows.
+    With replace=True, members not listed are removed. Returns (added, removed).
+    """
+    players = {t.strip().upper(): n for t, n in players.items()}
+    known = dict(db.execute(select(Player.tag, Player.name).where(Player.tag.in_(list(players)))).all())
+    for tag, name in players.items():
+        if tag not in known:
+            db.add(Player(tag=tag, name=name))
+        elif name and known[tag] != name:
+            db.get(Player, tag).name = name
+    db.flush()
+
+    current = set(member_tags(db, group.id))
+    add = sorted(set(players) - current)
+    if add:
+        db.execute(insert(GroupMember), [{"group_id": group.id, "player_tag": t} for t in add])
+    gone = sorted(current - set(players)) if replace else []
+    if gone:
+        db.execute(delete(GroupMember).where(GroupMember.group_id == group.id, GroupMember.player_tag.in_(gone)))
+    return len(add), len(gone)
+
+def remove_members(db: Session, group: Group, tags: list[str]) -> int:
+    tags = [t.strip().upper() for t in tags]
+    return db.execute(
+        delete(GroupMember).where(GroupMember.group_id == group.id, GroupMember.player_tag.in_(tags))
+    ).rowcount
+
+def delete_group(db: Session, group: Group):
+    for model in (GameGroup, SeriesGroup, GroupDuoStat, GroupMember):
+        db.execute(delete(model).where(model.group_id == group.id))
+    db.delete(group)
+
+def backfill_group(db: Session, group: Group) -> tuple[int, int]:
+    """
+    Link already-stored games and series whose four players are all members.
+    Clan membership is not stored per game, so a clan_tag is not re-checked
+    here; `python3 -m scripts.archive reprocess` re-classifies from raw payloads.
+    Returns (games linked, series linked).
+    """
+    members = select(GroupMember.player_tag).where(GroupMember.group_id == group.id).scalar_subquery()
+    def all_members(m):
+        return and_(m.teamA_tag1.in_(members), m.teamA_tag2.in_(members),
+                    m.teamB_tag1.in_(members), m.teamB_tag2.in_(members))
+
+    totals = _duo_totals()
+    have_games = select(GameGroup.game_id).where(GameGroup.group_id == group.id)
+    games = db.execute(
+        select(Game.id, Game.battle_time, Game.winner_team,
+               Game.teamA_tag1, Game.teamA_tag2, Game.teamB_tag1, Game.teamB_tag2)
+        .where(all_members(Game), Game.id.not_in(have_games))
+    ).all()
+    if games:
+        db.execute(insert(GameGroup), [{"group_id": group.id, "game_id": g[0], "battle_time": g[1]} for g in games])
+        for g in games:
+            _add_duos(totals, group.id, tuple(g[3:]), g[2], "games")
+
+    have_series = select(SeriesGroup.series_id).where(SeriesGroup.group_id == group.id)
+    series = db.execute(
+        select(Series.id, Series.winner_team,
+               Series.teamA_tag1, Series.teamA_tag2, Series.teamB_tag1, Series.teamB_tag2)
+        .where(all_members(Series), Series.id.not_in(have_series))
+    ).all()
+    if series:
+        db.execute(insert(SeriesGroup), [{"group_id": group.id, "series_id": s[0]} for s in series])
+        for s in series:
+            _add_duos(totals, group.id, tuple(s[2:]), s[1], "series")
+    bump_many(db, GroupDuoStat, totals)
+    if games or series:
+        bump_generation(db)
+    return len(games), len(series)
+
+def sync_env_group(db: Session) -> Group | None:
+    """Create/update the default group from PLAYER_TAGS, PLAYER_NAMES and CLAN_TAG."""
+    if not PLAYER_TAGS:
+        return None
+    group = get_group(db, DEFAULT_GROUP)
+    if group is None:
+        group = create_group(db, DEFAULT_GROUP, CLAN_TAG or DEFAULT_GROUP, CLAN_TAG)
+    elif group.clan_tag != CLAN_TAG:
+        group.clan_tag = CLAN_TAG
+    set_members(db, group, dict(zip(PLAYER_TAGS, PLAYER_NAMES)), replace=True)
+    return group
@@ -3,7 +3,10 @@ from typing import Tuple
 import hashlib
 from sqlalchemy.orm import Session
 from .models import Game, GamePlayer, GamePlayerCard
-from .config import TOUCHDOWN_DRAFT_MODE_ID, TWO_VS_TWO_TYPES, CLAN_TAG, PLAYER_TAGS
+from .config import TOUCHDOWN_DRAFT_MODE_ID, TWO_VS_TWO_TYPES
+from .pairs import record_game
+from .archive import archive_battle
+from .groups import Roster, link_game
 
 # Parse Clash Royale timestamp string into a timezone-aware datetime
 def parse_time(ts: str) -> datetime:
@@ -27,18 +30,11 @@ def is_target_mode(b: dict) -> bool:
         return False
     if (b.get("gameMode") or {}).get("id") != TOUCHDOWN_DRAFT_MODE_ID:
         return False
-    # Ensure 2v2 and (optionally) same clan
+    # Ensure 2v2 (clan requirements are per group, see groups.Roster)
     if len(b.get("team", [])) != 2 or len(b.get("opponent", [])) != 2:
         return False
-    if CLAN_TAG:
-        for p in (b.get("team", []) + b.get("opponent", [])):
-            clan = p.get("clan") or {}
-            if clan.get("tag") != CLAN_TAG:
-                return False
     return True
 
-# Set of player tags we care about
-ALLOWED = {t.strip().upper() for t in PLAYER_TAGS}
 def participants(b: dict) -> set[str]:
     return {p["tag"].strip().upper() for p in b.get("team", []) + b.get("opponent", [])}
 
@@ -64,25 +60,36 @@ def winner_team(b: dict) -> str:
     if o > a: return 'B'
     return 'D'
 
-# Insert a battle into the database if it's a new, relevant game
-def upsert_game(db: Session, b: dict) -> bool:
+# Insert a battle into the database if it's a new, relevant game.
+# Relevant battles are also kept verbatim in the raw archive unless archive=False
+# (reprocessing reads them back from it). A game is stored once and linked to
+# every group it qualifies for in `roster` (load it once per run: load_roster).
+def upsert_game(db: Session, b: dict, roster: Roster, archive: bool = True) -> bool:
     if not is_target_mode(b):
         return False
-    if not participants(b) <= ALLOWED:
-        return False  # skip games with any outsider
+    if archive:
+        archive_battle(db, game_uid(b), parse_time(b["battleTime"]).replace(tzinfo=None), b)
+    groups = roster.classify(b)
+    if not groups:
+        return False  # skip games with an outsider to every group
 
     # Check for recent games with same players to avoid duplicates from API
     (a1, a2), (b1, b2), swapped = normalize_teams(b)
     bt_naive = parse_time(b["battleTime"]).replace(tzinfo=None)
     time_delta = timedelta(seconds=5)
 
-    if db.query(Game.id).filter(
+    dup = db.query(
+        Game.id, Game.battle_time, Game.winner_team,
+        Game.teamA_tag1, Game.teamA_tag2, Game.teamB_tag1, Game.teamB_tag2,
+    ).filter(
         Game.teamA_tag1 == a1,
         Game.teamA_tag2 == a2,
         Game.teamB_tag1 == b1,
         Game.teamB_tag2 == b2,
         Game.battle_time.between(bt_naive - time_delta, bt_naive + time_delta)
-    ).first():
+    ).first()
+    if dup:
+        link_game(db, dup, groups)  # may qualify for a newly added group
         return False
 
     gid = game_uid(b)
@@ -116,6 +123,8 @@ def upsert_game(db: Session, b: dict) -> bool:
         season_id=None,
     )
     db.add(g)
+    link_game(db, g, groups, new=True)
+    record_game(db, (a1, a2), (b1, b2), w)
 
     # write GamePlayer rows according to canonical A/B
     # figure out which original list maps to canonical A
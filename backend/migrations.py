@@ -0,0 +1,197 @@
+from __future__ import annotations
+from contextlib import contextmanager
+from datetime import datetime
+from sqlalchemy import Connection, Engine, delete, insert, inspect, select, text
+from sqlalchemy.orm import Session
+from .db import Base, engine
+from .models import Game, Series, RatingDelta, RatingModelMeta, SchemaMigration
+
+# Versioned migrations. create_all() builds any missing tables from models.py;
+# each migration below then converts data left behind by older schemas. They run
+# once, in order, inside a single transaction, and must be no-ops on a fresh DB.
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - not on Windows
+    fcntl = None
+
+
+def _m001_compact_rating_history(conn: Connection):
+    """
+    elo_history / rating_history (one row per player per series) were replaced
+    by rating_deltas (one row per series). Their values are rounded snapshots,
+    so rather than converting them, drop them along with the replay state:
+    migration 6 then rates the stored series exactly from scratch.
+    """
+    insp = inspect(conn)
+    old = [name for name in ("elo_history", "rating_history") if insp.has_table(name)]
+    if not old:
+        return
+    for name in old:
+        conn.execute(text(f"DROP TABLE {name}"))
+    conn.execute(delete(RatingDelta))
+    conn.execute(delete(RatingModelMeta))
+
+
+def _create_missing_indexes(conn: Connection):
+    # create_all() never adds indexes to tables that already exist
+    for t in Base.metadata.sorted_tables:
+        for idx in t.indexes:
+            idx.create(conn, checkfirst=True)
+    if conn.dialect.name == "sqlite":
+        conn.execute(text("ANALYZE"))  # planner statistics for the new indexes
+
+def _m002_access_path_indexes(conn: Connection):
+    """
+    Create every index declared in models.py that an older database is missing
+    (per-player, per-card, per-slot series and ingest dedup access paths).
+    """
+    _create_missing_indexes(conn)
+
+
+def _m003_groups(conn: Connection):
+    """
+    Rosters moved from the environment into the groups tables. Create the
+    default group from PLAYER_TAGS / CLAN_TAG and link every stored game and
+    series to it: ingest only ever kept games between those players.
+    """
+    from .groups import DEFAULT_GROUP, backfill_group, get_group, sync_env_group
+
+    db = Session(bind=conn)
+    try:
+        sync_env_group(db)
+        group = get_group(db, DEFAULT_GROUP)
+        if group is not None:
+            backfill_group(db, group)
+        db.flush()
+    finally:
+        db.close()
+
+
+def _m004_form(conn: Connection):
+    """
+    Index games in (battle_time, id) order for the form watermark. form_state
+    and momentum_stats are filled by migration 7.
+    """
+    _create_missing_indexes(conn)
+
+
+def _with_session(conn: Connection, fn):
+    # ORM helpers on the migration's connection; their commit() does not end
+    # the outer migration transaction (the session joins it)
+    db = Session(bind=conn)
+    try:
+        fn(db)
+        db.flush()
+    finally:
+        db.close()
+
+def _m005_pair_stats(conn: Connection):
+    """
+    pair_stats / duo_matchups only count games ingested after they were added;
+    fill them once from every stored game and series.
+    """
+    from .pairs import rebuild_pairs
+
+    if conn.execute(select(Game.id).limit(1)).first() is not None:
+        _with_session(conn, rebuild_pairs)
+
+def _m006_ratings(conn: Connection):
+    """
+    Rate the stored series now rather than on the next sync that brings a new
+    game: migration 1 drops the old history and its replay state, so the rating
+    endpoints would be empty until then. No-op when the state is already current.
+    """
+    from .ratings import update_ratings
+
+    if conn.execute(select(Series.id).limit(1)).first() is not None:
+        _with_session(conn, update_ratings)
+
+def _m007_form(conn: Connection):
+    """
+    Build form_state / momentum_stats from the stored games and series now
+    instead of on the next sync. No-op when they are already current.
+    """
+    from .form import update_form
+
+    if conn.execute(select(Game.id).limit(1)).first() is not None:
+        _with_session(conn, update_form)
+
+def _m008_group_duo_stats(conn: Connection):
+    """
+    Fill group_duo_stats from the stored group links; the duo leaderboard reads
+    it instead of aggregating each group's games and series per request. The
+    index the old global leaderboard used goes away.
+    """
+    from .groups import rebuild_group_duos
+
+    conn.execute(text("DROP INDEX IF EXISTS ix_pair_relation_series_wins"))
+    if conn.execute(select(Game.id).limit(1)).first() is not None:
+        _with_session(conn, rebuild_group_duos)
+
+
+MIGRATIONS = [
+    (1, "compact rating history", _m001_compact_rating_history),
+    (2, "access path indexes", _m002_access_path_indexes),
+    (3, "groups", _m003_groups),
+    (4, "form", _m004_form),
+    (5, "pair stats", _m005_pair_stats),
+    (6, "ratings", _m006_ratings),
+    (7, "form state", _m007_form),
+    (8, "group duo stats", _m008_group_duo_stats),
+]
+
+def run_migrations(bind: Engine = engine) -> list[int]:
+    """Apply pending migrations in order; returns the versions applied."""
+    applied = []
+    with bind.begin() as conn:
+        done = set(conn.scalars(select(SchemaMigration.version)))
+        for version, name, fn in MIGRATIONS:
+            if version in done:
+                continue
+            fn(conn)
+            conn.execute(insert(SchemaMigration).values(
+                version=version, name=name, applied_at=datetime.utcnow(),
+            ))
+            applied.append(version)
+    return applied
+
+@contextmanager
+def _init_lock(bind: Engine = engine):
+    # API workers, the scheduler and scripts may all start at once; the
+    # create_all / migration checks are not atomic, so hold an exclusive file
+    # lock next to the SQLite database while one process runs them
+    path = bind.url.database if bind.dialect.name == "sqlite" else None
+    if fcntl is None or not path or path == ":memory:":
+        yield
+        return
+    with open(f"{path}.lock", "a") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+def init_db() -> list[int]:
+    """
+    Create missing tables, run pending migrations, then sync the default group
+    from the environment. A default group created here (PLAYER_TAGS was empty
+    when migration 3 ran) gets the stored history linked, as the migration would.
+    Concurrent callers take turns; the later ones find nothing left to do.
+    """
+    from .groups import DEFAULT_GROUP, backfill_group, get_group, sync_env_group
+
+    with _init_lock(engine):
+        Base.metadata.create_all(bind=engine)
+        applied = run_migrations(engine)
+        with Session(engine) as db:
+            existed = get_group(db, DEFAULT_GROUP) is not None
+            group = sync_env_group(db)
+            if group is not None and not existed:
+                backfill_group(db, group)
+            db.commit()
+    return applied
+
+if __name__ == "__main__":
+    versions = init_db()
+    print(f"Database ready. Applied migrations: {versions or 'none'}.")
@@ -26,6 +26,13 @@ class Game(Base):
     season_id: Mapped[int | None] = mapped_column(Integer, nullable=True)
     players: Mapped[list["GamePlayer"]] = relationship(back_populates="game", cascade="all, delete-orphan")
 
+    __table_args__ = (
+        # ingest dedup: same four players within a few seconds
+        Index("ix_games_teams_time", "teamA_tag1", "teamA_tag2", "teamB_tag1", "teamB_tag2", "battle_time"),
+        # chronological replay order used by the form watermark
+        Index("ix_games_order", "battle_time", "id"),
+    )
+
 class GamePlayer(Base):
     __tablename__ = "game_players"
     game_id: Mapped[str] = mapped_column(String, ForeignKey("games.id", ondelete="CASCADE"), primary_key=True)
@@ -35,12 +42,21 @@ class GamePlayer(Base):
     elixir_leaked: Mapped[float] = mapped_column(Float)
     game: Mapped[Game] = relationship(back_populates="players")
 
+    __table_args__ = (
+        # per-player reads (elixir stats, top cards join) without touching the table
+        Index("ix_game_players_player", "player_tag", "game_id", "team", "elixir_leaked"),
+    )
+
 class GamePlayerCard(Base):
     __tablename__ = "game_player_cards"
     game_id: Mapped[str] = mapped_column(String, ForeignKey("games.id", ondelete="CASCADE"), primary_key=True)
     player_tag: Mapped[str] = mapped_column(String, ForeignKey("players.tag", ondelete="CASCADE"), primary_key=True)
     card_id: Mapped[int] = mapped_column(Integer, primary_key=True)
 
+    __table_args__ = (
+        Index("ix_game_player_cards_card", "card_id", "game_id", "player_tag"),
+    )
+
 class Series(Base):
     __tablename__ = "series"
     id: Mapped[str] = mapped_column(String, primary_key=True)
@@ -60,16 +76,242 @@ class Series(Base):
             "teamA_tag1", "teamA_tag2", "teamB_tag1", "teamB_tag2", "started_at",
             name="uq_series_pair_time",
         ),
+        # one index per tag slot: player lookups (OR over the four slots) and wins per side
+        Index("ix_series_a1_winner", "teamA_tag1", "winner_team"),
+        Index("ix_series_a2_winner", "teamA_tag2", "winner_team"),
+        Index("ix_series_b1_winner", "teamB_tag1", "winner_team"),
+        Index("ix_series_b2_winner", "teamB_tag2", "winner_team"),
+        # chronological replay order used by the rating engine
+        Index("ix_series_order", "ended_at", "started_at", "id"),
     )
 
-class EloHistory(Base):
-    __tablename__ = "elo_history"
+class Group(Base):
+    """A tracked roster. Battles between four members (all in clan_tag, if set) belong to it."""
+    __tablename__ = "groups"
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
-    player_tag: Mapped[str] = mapped_column(String, ForeignKey("players.tag", ondelete="RESTRICT"), index=True)
-    timestamp: Mapped[datetime] = mapped_column(DateTime, index=True)  # store naive UTC (consistent with games/series)
-    elo: Mapped[int] = mapped_column(Integer)
+    slug: Mapped[str] = mapped_column(String, unique=True)
+    name: Mapped[str] = mapped_column(String)
+    clan_tag: Mapped[str | None] = mapped_column(String, nullable=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime)
+
+class GroupMember(Base):
+    __tablename__ = "group_members"
+
+    group_id: Mapped[int] = mapped_column(Integer, ForeignKey("groups.id", ondelete="CASCADE"), primary_key=True)
+    player_tag: Mapped[str] = mapped_column(String, ForeignKey("players.tag", ondelete="CASCADE"), primary_key=True)
 
     __table_args__ = (
-        Index("ix_elo_player_time", "player_tag", "timestamp"),
-    )
\ No newline at end of file
+        # tag -> groups, for building the ingest classifier
+        Index("ix_group_members_player", "player_tag", "group_id"),
+    )
+
+class GameGroup(Base):
+    """Which groups a game was classified into at ingest (battle_time copied for per-group recency)."""
+    __tablename__ = "game_groups"
+
+    group_id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    game_id: Mapped[str] = mapped_column(String, primary_key=True)
+    battle_time: Mapped[datetime] = mapped_column(DateTime)
+
+    __table_args__ = (
+        Index("ix_game_groups_time", "group_id", "battle_time"),
+        Index("ix_game_groups_game", "game_id", "group_id"),
+        {"sqlite_with_rowid": False},
+    )
+
+class SeriesGroup(Base):
+    """Which groups a series belongs to (those of its first game)."""
+    __tablename__ = "series_groups"
+
+    group_id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    series_id: Mapped[str] = mapped_column(String, primary_key=True)
+
+    __table_args__ = (
+        {"sqlite_with_rowid": False},
+    )
+
+class RawBattle(Base):
+    """Index of the raw battle archive: where each battle's compressed payload lives."""
+    __tablename__ = "raw_battles"
+
+    uid: Mapped[str] = mapped_column(String, primary_key=True)  # ingest.game_uid
+    battle_time: Mapped[datetime] = mapped_column(DateTime, index=True)
+    segment: Mapped[int] = mapped_column(Integer)
+    offset: Mapped[int] = mapped_column(Integer)
+    length: Mapped[int] = mapped_column(Integer)
+    codec: Mapped[int] = mapped_column(Integer)  # archive.CODEC_*
+    dict_no: Mapped[int] = mapped_column(Integer, default=0)  # zstd dictionary number, 0 = none
+
+class PairStat(Base):
+    """Running totals for one player relative to another, either as teammates or opponents."""
+    __tablename__ = "pair_stats"
+
+    player_tag: Mapped[str] = mapped_column(String, primary_key=True)
+    relation: Mapped[str] = mapped_column(String, primary_key=True)  # 'with' | 'vs'
+    other_tag: Mapped[str] = mapped_column(String, primary_key=True)
+    games: Mapped[int] = mapped_column(Integer, default=0)
+    game_wins: Mapped[int] = mapped_column(Integer, default=0)
+    series: Mapped[int] = mapped_column(Integer, default=0)
+    series_wins: Mapped[int] = mapped_column(Integer, default=0)
+
+class DuoMatchup(Base):
+    """Running totals for one duo against another duo (tags sorted within each duo)."""
+    __tablename__ = "duo_matchups"
+
+    duo_tag1: Mapped[str] = mapped_column(String, primary_key=True)
+    duo_tag2: Mapped[str] = mapped_column(String, primary_key=True)
+    opp_tag1: Mapped[str] = mapped_column(String, primary_key=True)
+    opp_tag2: Mapped[str] = mapped_column(String, primary_key=True)
+    games: Mapped[int] = mapped_column(Integer, default=0)
+    game_wins: Mapped[int] = mapped_column(Integer, default=0)
+    series: Mapped[int] = mapped_column(Integer, default=0)
+    series_wins: Mapped[int] = mapped_column(Integer, default=0)
+
+class GroupDuoStat(Base):
+    """Running totals for one duo (tags sorted) over the games and series linked to a group."""
+    __tablename__ = "group_duo_stats"
+
+    group_id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    duo_tag1: Mapped[str] = mapped_column(String, primary_key=True)
+    duo_tag2: Mapped[str] = mapped_column(String, primary_key=True)
+    games: Mapped[int] = mapped_column(Integer, default=0)
+    game_wins: Mapped[int] = mapped_column(Integer, default=0)
+    series: Mapped[int] = mapped_column(Integer, default=0)
+    series_wins: Mapped[int] = mapped_column(Integer, default=0)
+
+    __table_args__ = (
+        Index("ix_group_duo_series_wins", "group_id", "series_wins"),
+    )
+
+class PlayerId(Base):
+    """Small integer id per player tag, so wide tables store ints instead of tag strings."""
+    __tablename__ = "player_ids"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    tag: Mapped[str] = mapped_column(String, unique=True)
+
+class RatingDelta(Base):
+    """
+    One row per rated series per model: the four players (interned ids, teamA then
+    teamB) and the change in each one's rating. A player's timeline is the running
+    sum of their deltas in seq order, starting from the model's initial rating.
+    """
+    __tablename__ = "rating_deltas"
+
+    model: Mapped[str] = mapped_column(String, primary_key=True)
+    seq: Mapped[int] = mapped_column(Integer, primary_key=True)  # replay order of the series
+    timestamp: Mapped[datetime] = mapped_column(DateTime)  # naive UTC, Series.ended_at
+    p1: Mapped[int] = mapped_column(Integer)
+    p2: Mapped[int] = mapped_column(Integer)
+    p3: Mapped[int] = mapped_column(Integer)
+    p4: Mapped[int] = mapped_column(Integer)
+    d1: Mapped[float] = mapped_column(Float)
+    d2: Mapped[float] = mapped_column(Float)
+    d3: Mapped[float] = mapped_column(Float)
+    d4: Mapped[float] = mapped_column(Float)
+
+    __table_args__ = (
+        Index("ix_rating_deltas_p1", "model", "p1", "seq"),
+        Index("ix_rating_deltas_p2", "model", "p2", "seq"),
+        Index("ix_rating_deltas_p3", "model", "p3", "seq"),
+        Index("ix_rating_deltas_p4", "model", "p4", "seq"),
+        {"sqlite_with_rowid": False},
+    )
+
+class RatingState(Base):
+    """Latest in-memory state of each rating model per player, for incremental updates."""
+    __tablename__ = "rating_state"
+
+    model: Mapped[str] = mapped_column(String, primary_key=True)
+    player_tag: Mapped[str] = mapped_column(String, primary_key=True)
+    state: Mapped[str] = mapped_column(Text)  # JSON array of floats
+
+class RatingModelMeta(Base):
+    """Per-model replay watermark and running predictive-accuracy totals."""
+    __tablename__ = "rating_model_meta"
+
+    model: Mapped[str] = mapped_column(String, primary_key=True)
+    series_count: Mapped[int] = mapped_column(Integer, default=0)
+    last_ended_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
+    last_started_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
+    last_series_id: Mapped[str | None] = mapped_column(String, nullable=True)
+    predictions: Mapped[int] = mapped_column(Integer, default=0)
+    correct: Mapped[float] = mapped_column(Float, default=0.0)
+    brier: Mapped[float] = mapped_column(Float, default=0.0)
+    log_loss: Mapped[float] = mapped_column(Float, default=0.0)
+
+class FormState(Base):
+    """
+    Sliding-window form of one player or duo (subject is a tag, or "tag1+tag2"
+    for a duo): the last FORM_WINDOW results as a string, oldest first
+    ('W' | 'L' | 'D'), plus current and longest streaks. Streaks are signed:
+    +n is n wins in a row, -n is n losses in a row; a draw ends a streak.
+    """
+    __tablename__ = "form_state"
+
+    kind: Mapped[str] = mapped_column(String, primary_key=True)  # 'player' | 'duo'
+    subject: Mapped[str] = mapped_column(String, primary_key=True)
+    games_recent: Mapped[str] = mapped_column(String, default="")
+    games_streak: Mapped[int] = mapped_column(Integer, default=0)
+    games_best_streak: Mapped[int] = mapped_column(Integer, default=0)
+    games_worst_streak: Mapped[int] = mapped_column(Integer, default=0)  # longest losing run
+    series_recent: Mapped[str] = mapped_column(String, default="")
+    series_streak: Mapped[int] = mapped_column(Integer, default=0)
+    series_best_streak: Mapped[int] = mapped_column(Integer, default=0)
+    series_worst_streak: Mapped[int] = mapped_column(Integer, default=0)
+    last_game_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
+
+class MomentumStat(Base):
+    """Running intra-series counters for one player or duo, taken from each completed Bo7."""
+    __tablename__ = "momentum_stats"
+
+    kind: Mapped[str] = mapped_column(String, primary_key=True)  # 'player' | 'duo'
+    subject: Mapped[str] = mapped_column(String, primary_key=True)
+    series: Mapped[int] = mapped_column(Integer, default=0)
+    series_wins: Mapped[int] = mapped_column(Integer, default=0)
+    game1_wins: Mapped[int] = mapped_column(Integer, default=0)
+    game1_conversions: Mapped[int] = mapped_column(Integer, default=0)  # won game 1 and the series
+    led: Mapped[int] = mapped_column(Integer, default=0)  # was ahead at some point
+    blown_leads: Mapped[int] = mapped_column(Integer, default=0)
+    trailed: Mapped[int] = mapped_column(Integer, default=0)  # was behind at some point
+    comebacks: Mapped[int] = mapped_column(Integer, default=0)
+    trailed_0_3: Mapped[int] = mapped_column(Integer, default=0)
+    comebacks_0_3: Mapped[int] = mapped_column(Integer, default=0)
+    deciders: Mapped[int] = mapped_column(Integer, default=0)  # reached 3-3
+    decider_wins: Mapped[int] = mapped_column(Integer, default=0)
+    after_win: Mapped[int] = mapped_column(Integer, default=0)  # games right after winning one
+    after_win_wins: Mapped[int] = mapped_column(Integer, default=0)
+    after_loss: Mapped[int] = mapped_column(Integer, default=0)  # games right after losing one
+    after_loss_wins: Mapped[int] = mapped_column(Integer, default=0)
+
+class FormMeta(Base):
+    """Watermarks of the last game and series folded into form_state (single row, id=1)."""
+    __tablename__ = "form_meta"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    games_count: Mapped[int] = mapped_column(Integer, default=0)
+    last_game_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
+    last_game_id: Mapped[str | None] = mapped_column(String, nullable=True)
+    series_count: Mapped[int] = mapped_column(Integer, default=0)
+    last_ended_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
+    last_started_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
+    last_series_id: Mapped[str | None] = mapped_column(String, nullable=True)
+
+class DataGeneration(Base):
+    """
+    Single row (id 1) bumped by rebuilds and re-linking that can leave the latest
+    game and series unchanged; part of the API's data version (warm.data_version).
+    """
+    __tablename__ = "data_generation"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    generation: Mapped[int] = mapped_column(Integer, default=0)
+
+class SchemaMigration(Base):
+    """Versioned schema/data migrations already applied (see migrations.py)."""
+    __tablename__ = "schema_migrations"
+
+    version: Mapped[int] = mapped_column(Integer, primary_key=True)
+    name: Mapped[str] = mapped_column(String)
+    applied_at: Mapped[datetime] = mapped_column(DateTime)
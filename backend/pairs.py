@@ -0,0 +1,94 @@
+from __future__ import annotations
+from collections import defaultdict
+from sqlalchemy import select, insert, delete
+from sqlalchemy.orm import Session
+from .models import Game, Series, PairStat, DuoMatchup
+from .counters import bump, bump_many
+from .warm import bump_generation
+
+# Pairwise teammate / rival totals, kept up to date as games and series are written
+# so the endpoints can read one player's rows by primary-key prefix.
+
+WITH = "with"
+VS = "vs"
+
+# Yield (model, key, won) for every row touched by one result between two duos
+def _rows_for(teamA: tuple[str, str], teamB: tuple[str, str], winner: str):
+    for mine, theirs, side in ((teamA, teamB, 'A'), (teamB, teamA, 'B')):
+        won = winner == side
+        p1, p2 = mine
+        yield PairStat, {"player_tag": p1, "relation": WITH, "other_tag": p2}, won
+        yield PairStat, {"player_tag": p2, "relation": WITH, "other_tag": p1}, won
+        for p in mine:
+            for o in theirs:
+                yield PairStat, {"player_tag": p, "relation": VS, "other_tag": o}, won
+        d1, d2 = sorted(mine)
+        o1, o2 = sorted(theirs)
+        yield DuoMatchup, {"duo_tag1": d1, "duo_tag2": d2, "opp_tag1": o1, "opp_tag2": o2}, won
+
+def record_game(db: Session, teamA: tuple[str, str], teamB: tuple[str, str], winner: str):
+    """Count one game (winner 'A' | 'B' | 'D') for every pair and duo matchup involved."""
+    for model, key, won in _rows_for(teamA, teamB, winner):
+        bump(db, model, key, {"games": 1, "game_wins": int(won)})
+
+def record_series(db: Session, teamA: tuple[str, str], teamB: tuple[str, str], winner: str):
+    """Count one finished series (winner 'A' | 'B') for every pair and duo matchup involved."""
+    for model, key, won in _rows_for(teamA, teamB, winner):
+        bump(db, model, key, {"series": 1, "series_wins": int(won)})
+
+def record_series_many(db: Session, results: list[tuple[tuple[str, str], tuple[str, str], str]]) -> int:
+    """
+    record_series() for many (teamA, teamB, winner) results at once: the
+    increments are summed in memory and written with executemany.
+    Returns the number of rows touched.
+    """
+    totals = {PairStat: defaultdict(lambda: defaultdict(int)), DuoMatchup: defaultdict(lambda: defaultdict(int))}
+    for teamA, teamB, winner in results:
+        for model, key, won in _rows_for(teamA, teamB, winner):
+            t = totals[model][tuple(key.items())]
+            t["series"] += 1
+            t["series_wins"] += int(won)
+    return sum(bump_many(db, model, rows) for model, rows in totals.items())
+
+def rebuild_pairs(db: Session) -> int:
+    """
+    Recompute pair_stats and duo_matchups from scratch from all Games and Series.
+    Used to backfill an existing database; regular ingest keeps them current.
+    Returns the number of rows written.
+    """
+    db.execute(delete(PairStat))
+    db.execute(delete(DuoMatchup))
+
+    totals = {PairStat: defaultdict(lambda: [0, 0, 0, 0]), DuoMatchup: defaultdict(lambda: [0, 0, 0, 0])}
+
+    game_rows = db.execute(select(
+        Game.teamA_tag1, Game.teamA_tag2, Game.teamB_tag1, Game.teamB_tag2, Game.winner_team
+    )).all()
+    for a1, a2, b1, b2, w in game_rows:
+        for model, key, won in _rows_for((a1, a2), (b1, b2), w):
+            t = totals[model][tuple(key.items())]
+            t[0] += 1
+            t[1] += int(won)
+
+    series_rows = db.execute(select(
+        Series.teamA_tag1, Series.teamA_tag2, Series.teamB_tag1, Series.teamB_tag2, Series.winner_team
+    )).all()
+    for a1, a2, b1, b2, w in series_rows:
+        for model, key, won in _rows_for((a1, a2), (b1, b2), w):
+            t = totals[model][tuple(key.items())]
+            t[2] += 1
+            t[3] += int(won)
+
+    written = 0
+    for model, rows in totals.items():
+        payload = [
+            {**dict(key), "games": g, "game_wins": gw, "series": s, "series_wins": sw}
+            for key, (g, gw, s, sw) in rows.items()
+        ]
+        if payload:
+            db.execute(insert(model), payload)
+            written += len(payload)
+
+    bump_generation(db)
+    db.commit()
+    return written
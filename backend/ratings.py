@@ -0,0 +1,436 @@
+from __future__ import annotations
+from abc import ABC, abstractmethod
+from math import sqrt, exp, log, pi, erf
+import json
+from sqlalchemy import select, delete, insert, func, tuple_, union_all
+from sqlalchemy.orm import Session
+from .models import Series, PlayerId, RatingDelta, RatingState, RatingModelMeta
+from .elo import START_ELO, _k_for, _exp_vs_two
+from .warm import bump_generation
+
+# Pluggable rating engine: a single chronological replay over Series feeds every
+# registered model. Each model keeps a small list of floats per player as state.
+
+class RatingModel(ABC):
+    name = ""
+
+    @abstractmethod
+    def new_state(self) -> list[float]:
+        """State for a player's first series."""
+
+    @abstractmethod
+    def predict(self, A: list[list[float]], B: list[list[float]]) -> float:
+        """Probability that team A wins, from the states before the series."""
+
+    @abstractmethod
+    def update(self, A: list[list[float]], B: list[list[float]], score_A: float) -> list[float]:
+        """Update the four player states in place; return the change in value() for A1, A2, B1, B2."""
+
+    @abstractmethod
+    def value(self, state: list[float]) -> float:
+        """Unrounded rating value; history stores per-series deltas of this."""
+
+    @abstractmethod
+    def display(self, value: float) -> float:
+        """Rounded value shown in history/leaderboards."""
+
+    def _update_by_value(self, A, B, score_A, rate) -> list[float]:
+        before = [self.value(st) for st in A + B]
+        rate(A, B, score_A)
+        return [self.value(st) - b for st, b in zip(A + B, before)]
+
+
+class EloModel(RatingModel):
+    """The original Elo variant from elo.py. State: [elo, series_played]."""
+    name = "elo"
+
+    def new_state(self):
+        return [START_ELO, 0.0]
+
+    def _expected(self, A, B):
+        (e1, _), (e2, _) = A
+        (e3, _), (e4, _) = B
+        expected_A = (_exp_vs_two(e1, e3, e4) + _exp_vs_two(e2, e3, e4)) / 2.0
+        expected_B = (_exp_vs_two(e3, e1, e2) + _exp_vs_two(e4, e1, e2)) / 2.0
+        return expected_A, expected_B
+
+    def predict(self, A, B):
+        # expected_A + expected_B == 1, so the team expectation is already a probability
+        return self._expected(A, B)[0]
+
+    def update(self, A, B, score_A):
+        expected_A, expected_B = self._expected(A, B)
+        deltas = []
+        for team, score, expected in ((A, score_A, expected_A), (B, 1.0 - score_A, expected_B)):
+            for st in team:
+                # keep the exact increment so a cumulative sum replays the same floats
+                d = _k_for(int(st[1])) * (score - expected)
+                st[0] = st[0] + d
+                st[1] += 1.0
+                deltas.append(d)
+        return deltas
+
+    def value(self, state):
+        return state[0]
+
+    def display(self, value):
+        return int(round(value))
+
+
+GLICKO_SCALE = 173.7178
+
+class Glicko2Model(RatingModel):
+    """
+    Glicko-2 with each player rated against a composite opponent
+    (mean mu, RMS phi of the other duo). State: [mu, phi, sigma] on the Glicko-2 scale.
+    """
+    name = "glicko2"
+
+    def __init__(self, rating=1500.0, rd=350.0, vol=0.06, tau=0.5):
+        self.mu0 = (rating - 1500.0) / GLICKO_SCALE
+        self.phi0 = rd / GLICKO_SCALE
+        self.vol0 = vol
+        self.tau = tau
+
+    def new_state(self):
+        return [self.mu0, self.phi0, self.vol0]
+
+    @staticmethod
+    def _g(phi):
+        return 1.0 / sqrt(1.0 + 3.0 * phi * phi / (pi * pi))
+
+    @staticmethod
+    def _team(team):
+        mu = sum(st[0] for st in team) / len(team)
+        phi = sqrt(sum(st[1] * st[1] for st in team) / len(team))
+        return mu, phi
+
+    def predict(self, A, B):
+        mu_a, phi_a = self._team(A)
+        mu_b, phi_b = self._team(B)
+        return 1.0 / (1.0 + exp(-self._g(sqrt(phi_a * phi_a + phi_b * phi_b)) * (mu_a - mu_b)))
+
+    def _rate(self, st, mu_j, phi_j, score):
+        mu, phi, sigma = st
+        g = self._g(phi_j)
+        E = 1.0 / (1.0 + exp(-g * (mu - mu_j)))
+        v = 1.0 / (g * g * E * (1.0 - E))
+        delta = v * g * (score - E)
+
+        # Volatility update (Illinois algorithm, step 5 of the Glicko-2 paper)
+        a = log(sigma * sigma)
+        tau2 = self.tau * self.tau
+        def f(x):
+            ex = exp(x)
+            d = phi * phi + v + ex
+            return ex * (delta * delta - d) / (2.0 * d * d) - (x - a) / tau2
+        A_ = a
+        if delta * delta > phi * phi + v:
+            B_ = log(delta * delta - phi * phi - v)
+        else:
+            k = 1
+            while f(a - k * self.tau) < 0:
+                k += 1
+            B_ = a - k * self.tau
+        fA, fB = f(A_), f(B_)
+        while abs(B_ - A_) > 1e-6:
+            C_ = A_ + (A_ - B_) * fA / (fB - fA)
+            fC = f(C_)
+            if fC * fB <= 0:
+                A_, fA = B_, fB
+            else:
+                fA /= 2.0
+            B_, fB = C_, fC
+        sigma_new = exp(A_ / 2.0)
+
+        phi_star = sqrt(phi * phi + sigma_new * sigma_new)
+        phi_new = 1.0 / sqrt(1.0 / (phi_star * phi_star) + 1.0 / v)
+        st[0] = mu + phi_new * phi_new * g * (score - E)
+        st[1] = phi_new
+        st[2] = sigma_new
+
+    def _update(self, A, B, score_A):
+        opp_A = self._team(B)
+        opp_B = self._team(A)
+        for st in A:
+            self._rate(st, *opp_A, score_A)
+        for st in B:
+            self._rate(st, *opp_B, 1.0 - score_A)
+
+    def update(self, A, B, score_A):
+        return self._update_by_value(A, B, score_A, self._update)
+
+    def value(self, state):
+        return state[0] * GLICKO_SCALE + 1500.0
+
+    def display(self, value):
+        return round(value, 2)
+
+
+def _norm_pdf(x):
+    return exp(-x * x / 2.0) / sqrt(2.0 * pi)
+
+def _norm_cdf(x):
+    return 0.5 * (1.0 + erf(x / sqrt(2.0)))
+
+class TrueSkillModel(RatingModel):
+    """
+    Two-team TrueSkill update without draws (team performance = sum of players).
+    State: [mu, sigma]. Displayed as the conservative mu - 3*sigma.
+    """
+    name = "trueskill"
+
+    def __init__(self, mu=25.0, sigma=25.0 / 3.0, beta=25.0 / 6.0, tau=25.0 / 300.0):
+        self.mu0 = mu
+        self.sigma0 = sigma
+        self.beta = beta
+        self.tau = tau
+
+    def new_state(self):
+        return [self.mu0, self.sigma0]
+
+    def _c(self, A, B, tau2=0.0):
+        return sqrt(sum(st[1] * st[1] + tau2 + self.beta * self.beta for st in A + B))
+
+    def predict(self, A, B):
+        diff = sum(st[0] for st in A) - sum(st[0] for st in B)
+        return _norm_cdf(diff / self._c(A, B))
+
+    def update(self, A, B, score_A):
+        return self._update_by_value(A, B, score_A, self._update)
+
+    def _update(self, A, B, score_A):
+        winners, losers = (A, B) if score_A >= 0.5 else (B, A)
+        tau2 = self.tau * self.tau
+        c = self._c(A, B, tau2)
+        t = (sum(st[0] for st in winners) - sum(st[0] for st in losers)) / c
+        cdf = max(_norm_cdf(t), 1e-12)
+        v = _norm_pdf(t) / cdf
+        w = v * (v + t)
+        for team, sign in ((winners, 1.0), (losers, -1.0)):
+            for st in team:
+                var = st[1] * st[1] + tau2
+                st[0] += sign * var / c * v
+                st[1] = sqrt(var * max(1.0 - var / (c * c) * w, 1e-6))
+
+    def value(self, state):
+        return state[0] - 3.0 * state[1]
+
+    def display(self, value):
+        return round(value, 2)
+
+
+MODELS: dict[str, RatingModel] = {m.name: m for m in (EloModel(), Glicko2Model(), TrueSkillModel())}
+
+
+class _Accuracy:
+    __slots__ = ("predictions", "correct", "brier", "log_loss")
+
+    def __init__(self, predictions=0, correct=0.0, brier=0.0, log_loss=0.0):
+        self.predictions = predictions
+        self.correct = correct
+        self.brier = brier
+        self.log_loss = log_loss
+
+    def add(self, p: float, score_A: float):
+        self.predictions += 1
+        if p == 0.5:
+            self.correct += 0.5
+        elif (p > 0.5) == (score_A == 1.0):
+            self.correct += 1.0
+        self.brier += (p - score_A) ** 2
+        q = min(max(p if score_A == 1.0 else 1.0 - p, 1e-12), 1.0)
+        self.log_loss -= log(q)
+
+
+_ORDER = (Series.ended_at.asc(), Series.started_at.asc(), Series.id.asc())
+
+def series_rows(db: Session, after: tuple | None = None):
+    """Series in replay order (ended, started, id), optionally only those after a watermark key."""
+    q = select(
+        Series.id, Series.started_at, Series.ended_at, Series.winner_team,
+        Series.teamA_tag1, Series.teamA_tag2, Series.teamB_tag1, Series.teamB_tag2,
+    ).order_by(*_ORDER)
+    if after is not None:
+        q = q.where(tuple_(Series.ended_at, Series.started_at, Series.id) > tuple_(*after))
+    return db.execute(q).all()
+
+def _replay(rows, states: dict, acc: dict, seq: int):
+    """
+    Feed every model with the given series in order. Mutates states/acc and
+    returns ({model: [delta rows]}, processed_count, last_key). `seq` is the
+    ordinal of the last series already rated.
+    """
+    history = {name: [] for name in MODELS}
+    last_key = None
+    processed = 0
+    for sid, started, ended, winner, a1, a2, b1, b2 in rows:
+        processed += 1
+        last_key = (ended, started, sid)
+        if winner not in ("A", "B"):
+            continue
+        score_A = 1.0 if winner == "A" else 0.0
+        tags = (a1, a2, b1, b2)
+        for name, model in MODELS.items():
+            st = states[name]
+            for p in tags:
+                if p not in st:
+                    st[p] = model.new_state()
+            A = [st[a1], st[a2]]
+            B = [st[b1], st[b2]]
+            acc[name].add(model.predict(A, B), score_A)
+            history[name].append((seq + processed, ended, tags, model.update(A, B, score_A)))
+    return history, processed, last_key
+
+def intern_players(db: Session, tags) -> dict[str, int]:
+    """Map player tags to their small integer ids, assigning ids to new tags."""
+    tags = set(tags)
+    if not tags:
+        return {}
+    ids = dict(db.execute(select(PlayerId.tag, PlayerId.id).where(PlayerId.tag.in_(tags))).all())
+    missing = tags - set(ids)
+    if missing:
+        db.execute(insert(PlayerId), [{"tag": t} for t in sorted(missing)])
+        ids.update(db.execute(select(PlayerId.tag, PlayerId.id).where(PlayerId.tag.in_(missing))).all())
+    return ids
+
+def _write_history(db: Session, history: dict) -> int:
+    ids = intern_players(db, (t for rows in history.values() for r in rows for t in r[2]))
+    inserted = 0
+    for name, rows in history.items():
+        if not rows:
+            continue
+        db.execute(insert(RatingDelta), [
+            {
+                "model": name, "seq": seq, "timestamp": ts,
+                "p1": ids[t1], "p2": ids[t2], "p3": ids[t3], "p4": ids[t4],
+                "d1": d1, "d2": d2, "d3": d3, "d4": d4,
+            }
+            for seq, ts, (t1, t2, t3, t4), (d1, d2, d3, d4) in rows
+        ])
+        inserted += len(rows)
+    return inserted
+
+def _save_state(db: Session, states: dict, acc: dict, series_count: int, last_key, touched: set[str] | None):
+    for name, st in states.items():
+        tags = list(st) if touched is None else [t for t in touched if t in st]
+        if not tags:
+            continue
+        db.execute(delete(RatingState).where(RatingState.model == name, RatingState.player_tag.in_(tags)))
+        db.execute(insert(RatingState), [
+            {"model": name, "player_tag": t, "state": json.dumps(st[t])} for t in tags
+        ])
+    for name, a in acc.items():
+        ended, started, sid = last_key if last_key else (None, None, None)
+        db.merge(RatingModelMeta(
+            model=name, series_count=series_count,
+            last_ended_at=ended, last_started_at=started, last_series_id=sid,
+            predictions=a.predictions, correct=a.correct, brier=a.brier, log_loss=a.log_loss,
+        ))
+
+def rebuild_ratings(db: Session) -> int:
+    """
+    Recompute every model's history from scratch in one pass over all Series
+    (chronological). All writes happen in one transaction.
+    Returns the number of history rows (one per model per series) inserted.
+    """
+    db.execute(delete(RatingDelta))
+    db.execute(delete(RatingState))
+    db.execute(delete(RatingModelMeta))
+
+    states = {name: {} for name in MODELS}
+    acc = {name: _Accuracy() for name in MODELS}
+    history, processed, last_key = _replay(series_rows(db), states, acc, seq=0)
+
+    inserted = _write_history(db, history)
+    _save_state(db, states, acc, processed, last_key, touched=None)
+    bump_generation(db)
+    db.commit()
+    return inserted
+
+def update_ratings(db: Session) -> int:
+    """
+    Apply only the series that sort after the last rated one. Falls back to a full
+    rebuild when there is no saved state or a series was inserted into the past.
+    Returns the number of history rows inserted.
+    """
+    metas = {m.model: m for m in db.scalars(select(RatingModelMeta))}
+    if set(metas) != set(MODELS):
+        return rebuild_ratings(db)
+    counts = {m.series_count for m in metas.values()}
+    keys = {(m.last_ended_at, m.last_started_at, m.last_series_id) for m in metas.values()}
+    if len(counts) != 1 or len(keys) != 1:
+        return rebuild_ratings(db)
+    series_count = counts.pop()
+    last_key = keys.pop()
+
+    if last_key[0] is None:
+        rated_before = 0
+    else:
+        rated_before = db.scalar(
+            select(func.count()).select_from(Series)
+            .where(tuple_(Series.ended_at, Series.started_at, Series.id) <= tuple_(*last_key))
+        ) or 0
+    if rated_before != series_count:
+        return rebuild_ratings(db)
+
+    rows = series_rows(db, after=last_key if last_key[0] is not None else None)
+    if not rows:
+        return 0
+
+    touched = {t for r in rows for t in r[4:8]}
+    states = {name: {} for name in MODELS}
+    for name, tag, state in db.execute(
+        select(RatingState.model, RatingState.player_tag, RatingState.state)
+        .where(RatingState.model.in_(list(MODELS)), RatingState.player_tag.in_(touched))
+    ):
+        states[name][tag] = json.loads(state)
+    acc = {
+        name: _Accuracy(m.predictions, m.correct, m.brier, m.log_loss)
+        for name, m in metas.items()
+    }
+
+    history, processed, new_key = _replay(rows, states, acc, seq=series_count)
+    inserted = _write_history(db, history)
+    _save_state(db, states, acc, series_count + processed, new_key, touched=touched)
+    db.commit()
+    return inserted
+
+def rating_timeline(db: Session, model: str, tag: str) -> list[tuple]:
+    """
+    One player's (timestamp, rating) points for a model: the player's deltas are
+    read through the four per-slot indexes and accumulated from the start rating.
+    """
+    pid = db.scalar(select(PlayerId.id).where(PlayerId.tag == tag))
+    if pid is None:
+        return []
+    parts = [
+        select(RatingDelta.seq, RatingDelta.timestamp, delta)
+        .where(RatingDelta.model == model, slot == pid)
+        for slot, delta in (
+            (RatingDelta.p1, RatingDelta.d1), (RatingDelta.p2, RatingDelta.d2),
+            (RatingDelta.p3, RatingDelta.d3), (RatingDelta.p4, RatingDelta.d4),
+        )
+    ]
+    rows = sorted(db.execute(union_all(*parts)).all())
+    m = MODELS[model]
+    value = m.value(m.new_state())
+    points = []
+    for _, ts, d in rows:
+        value = value + d
+        points.append((ts, m.display(value)))
+    return points
+
+def model_accuracy(db: Session) -> list[dict]:
+    """Predictive accuracy of each model over all rated series (predicted before each update)."""
+    out = []
+    for m in db.scalars(select(RatingModelMeta).order_by(RatingModelMeta.model)):
+        n = m.predictions or 0
+        out.append({
+            "model": m.model,
+            "predictions": n,
+            "accuracy": round(m.correct / n, 4) if n else 0.0,
+            "brier": round(m.brier / n, 4) if n else 0.0,
+            "log_loss": round(m.log_loss / n, 4) if n else 0.0,
+        })
+    return out
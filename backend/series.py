@@ -1,16 +1,24 @@
 from datetime import timedelta
-import json, hashlib
+from concurrent.futures import ProcessPoolExecutor
+import json, hashlib, os
 from sqlalchemy.orm import Session
-from sqlalchemy import select
+from sqlalchemy import select, insert
 from .models import Game, Series
 from .config import SESSION_MAX_GAP_MINUTES, TOUCHDOWN_DRAFT_MODE_ID
+from .pairs import record_series, record_series_many
+from .groups import link_series
+from .form import record_momentum, record_momentum_many
+from .warm import bump_generation
 
 MAX_GAP = timedelta(minutes=SESSION_MAX_GAP_MINUTES)
 
 # Return a canonical key for a pair of teams
 def pair_key(g: Game):
-    teamA = tuple(sorted([g.teamA_tag1, g.teamA_tag2]))
-    teamB = tuple(sorted([g.teamB_tag1, g.teamB_tag2]))
+    return _pair_key(g.teamA_tag1, g.teamA_tag2, g.teamB_tag1, g.teamB_tag2)
+
+def _pair_key(a1: str, a2: str, b1: str, b2: str):
+    teamA = tuple(sorted([a1, a2]))
+    teamB = tuple(sorted([b1, b2]))
     return tuple(sorted([teamA, teamB]))
 
 # Create a unique ID for a series based on teams and start time
@@ -34,72 +42,188 @@ def detect_series(db: Session, since_hours: int | None = 6):
 
     for pk, glist in grouped.items():
         glist.sort(key=lambda x: x.battle_time)
-        session = []
-        last_t = None
-        for g in glist:
-            if not session:
-                session = [g]
-                last_t = g.battle_time
-                continue
-            if (g.battle_time - last_t) > MAX_GAP:
-                _finish_session(db, pk, session)
-                session = [g]
-            else:
-                session.append(g)
-            last_t = g.battle_time
-        if session:
-            _finish_session(db, pk, session)
+        for s0, s1 in _split_sessions([g.battle_time for g in glist]):
+            _finish_session(db, pk, glist[s0:s1])
     db.commit()
 
+# Split one pairing's games (sorted by time) into sessions separated by more than MAX_GAP
+def _split_sessions(times: list) -> list[tuple[int, int]]:
+    """Return [start, end) index ranges of each session."""
+    ranges = []
+    start = 0
+    for i in range(1, len(times)):
+        if (times[i] - times[i - 1]) > MAX_GAP:
+            ranges.append((start, i))
+            start = i
+    if times:
+        ranges.append((start, len(times)))
+    return ranges
+
+# Core Bo7 scan over plain winner letters, shared by the ORM and the tuple paths
+def _bo7_chunks(winners: list[str]) -> list[tuple[int, int, str]]:
+    """
+    Walk a session's winners ('A' | 'B' | 'D') in order. Every time one side
+    reaches 4 wins a Bo7 is complete: emit (first_index, clinch_index, winner),
+    reset the counters and keep scanning for a back-to-back Bo7.
+    """
+    wins = {'A': 0, 'B': 0}
+    chunks = []
+    first = None
+    for i, w in enumerate(winners):
+        if first is None:
+            first = i
+        # Count only decisive games
+        if w in ('A', 'B'):
+            wins[w] += 1
+        if wins['A'] == 4 or wins['B'] == 4:
+            chunks.append((first, i, 'A' if wins['A'] == 4 else 'B'))
+            wins = {'A': 0, 'B': 0}
+            first = None
+    return chunks
+
 # Finalize a session of games, creating a Series if applicable
 def _finish_session(db: Session, pk, session_games: list[Game]):
     """
     Scan a contiguous time 'session' of games between the same two duos.
     Create a Series every time one side reaches 4 wins (Bo7), then reset
     counters and keep scanning in case there is another back-to-back Bo7.
+    Each new Bo7's game sequence also feeds the momentum counters.
     Returns the number of Series rows created.
     """
-    wins = {'A': 0, 'B': 0}
-    used: list[Game] = []          # games in the current Bo7-in-progress
-    current_start = None           # started_at for the current Bo7
     created = 0
+    for first, last, winner in _bo7_chunks([g.winner_team for g in session_games]):
+        used = session_games[first:last + 1]
+        # First game of this Bo7 chunk determines tags/mode
+        first_game = used[0]
+        current_start = first_game.battle_time
+        sid = series_id(pk, current_start)
 
-    for g in session_games:
-        # If we are starting a fresh Bo7 chunk, mark its start time
-        if not used:
-            current_start = g.battle_time
-        used.append(g)
+        if not db.get(Series, sid):
+            db.add(Series(
+                id=sid,
+                started_at=current_start,
+                ended_at=used[-1].battle_time,         # clincher time
+                mode_id=first_game.mode_id,
+                teamA_tag1=first_game.teamA_tag1,
+                teamA_tag2=first_game.teamA_tag2,
+                teamB_tag1=first_game.teamB_tag1,
+                teamB_tag2=first_game.teamB_tag2,
+                winner_team=winner,
+                game_ids=json.dumps([x.id for x in used]),
+                season_id=None,
+            ))
+            record_series(
+                db,
+                (first_game.teamA_tag1, first_game.teamA_tag2),
+                (first_game.teamB_tag1, first_game.teamB_tag2),
+                winner,
+            )
+            link_series(db, [(sid, first_game.id, (first_game.teamA_tag1, first_game.teamA_tag2,
+                                                    first_game.teamB_tag1, first_game.teamB_tag2), winner)])
+            record_momentum(
+                db,
+                (first_game.teamA_tag1, first_game.teamA_tag2),
+                (first_game.teamB_tag1, first_game.teamB_tag2),
+                [x.winner_team for x in used],
+                winner,
+            )
+            created += 1
 
-        # Count only decisive games
-        if g.winner_team in ('A', 'B'):
-            wins[g.winner_team] += 1
+    return created
 
-        # Check for Bo7 completion
-        if wins['A'] == 4 or wins['B'] == 4:
-            winner = 'A' if wins['A'] == 4 else 'B'
-            # First game of this Bo7 chunk determines tags/mode
-            first_game = used[0]
-            sid = series_id(pk, current_start)
-
-            if not db.get(Series, sid):
-                db.add(Series(
-                    id=sid,
-                    started_at=current_start,
-                    ended_at=g.battle_time,                # clincher time
-                    mode_id=first_game.mode_id,
-                    teamA_tag1=first_game.teamA_tag1,
-                    teamA_tag2=first_game.teamA_tag2,
-                    teamB_tag1=first_game.teamB_tag1,
-                    teamB_tag2=first_game.teamB_tag2,
-                    winner_team=winner,
-                    game_ids=json.dumps([x.id for x in used]),
-                    season_id=None,
-                ))
-                created += 1
-
-            # Reset to look for another Bo7 immediately after
-            wins = {'A': 0, 'B': 0}
-            used = []
-            current_start = None
 
-    return created
+# ---- Full-history recompute over lightweight tuples ----
+
+# Detect every Bo7 for a shard of pairings. Runs in a worker process, so it only
+# touches plain tuples: groups is [(pk, teams, [(game_id, battle_time, winner), ...])].
+def _detect_shard(groups: list) -> list[dict]:
+    out = []
+    for pk, (a1, a2, b1, b2), games in groups:
+        times = [g[1] for g in games]
+        for s0, s1 in _split_sessions(times):
+            session = games[s0:s1]
+            for first, last, winner in _bo7_chunks([g[2] for g in session]):
+                used = session[first:last + 1]
+                out.append({
+                    "id": series_id(pk, used[0][1]),
+                    "started_at": used[0][1],
+                    "ended_at": used[-1][1],
+                    "mode_id": TOUCHDOWN_DRAFT_MODE_ID,
+                    "teamA_tag1": a1, "teamA_tag2": a2,
+                    "teamB_tag1": b1, "teamB_tag2": b2,
+                    "winner_team": winner,
+                    "game_ids": json.dumps([g[0] for g in used]),
+                    "season_id": None,
+                })
+    return out
+
+# Stream (id, battle_time, teams, winner) tuples and group them by pairing
+def _load_groups(db: Session) -> list:
+    q = (
+        select(Game.id, Game.battle_time, Game.teamA_tag1, Game.teamA_tag2,
+               Game.teamB_tag1, Game.teamB_tag2, Game.winner_team)
+        .where(Game.mode_id == TOUCHDOWN_DRAFT_MODE_ID)
+        .order_by(Game.battle_time.asc())
+        .execution_options(yield_per=5000)
+    )
+    grouped: dict = {}
+    for gid, bt, a1, a2, b1, b2, w in db.execute(q):
+        pk = _pair_key(a1, a2, b1, b2)
+        entry = grouped.get(pk)
+        if entry is None:
+            # teams of the first game, exactly like _finish_session's first_game
+            entry = grouped[pk] = (pk, (a1, a2, b1, b2), [])
+        entry[2].append((gid, bt, w))
+    return list(grouped.values())
+
+# Split pairings into `n` shards of roughly equal game counts (largest first)
+def _shard(groups: list, n: int) -> list[list]:
+    shards = [[] for _ in range(n)]
+    loads = [0] * n
+    for g in sorted(groups, key=lambda g: len(g[2]), reverse=True):
+        i = loads.index(min(loads))
+        shards[i].append(g)
+        loads[i] += len(g[2])
+    return [s for s in shards if s]
+
+# Below this many games, process-pool startup costs more than the scan itself
+PARALLEL_MIN_GAMES = 20000
+
+def detect_groups(groups: list, workers: int | None = None, min_games: int = PARALLEL_MIN_GAMES) -> list[dict]:
+    """Run the Bo7 scan over grouped tuples, across a process pool when workers > 1."""
+    workers = workers or os.cpu_count() or 1
+    if workers <= 1 or len(groups) < 2 or sum(len(g[2]) for g in groups) < min_games:
+        return _detect_shard(groups)
+    shards = _shard(groups, workers)
+    with ProcessPoolExecutor(max_workers=len(shards)) as pool:
+        return [row for part in pool.map(_detect_shard, shards) for row in part]
+
+def recompute_series(db: Session, workers: int | None = None) -> int:
+    """
+    Full-history equivalent of detect_series(db, since_hours=None): streams game
+    tuples, detects Bo7s in parallel, prefetches existing series ids in one query
+    and bulk-inserts only the new ones. Returns the number of Series created.
+    """
+    groups = _load_groups(db)
+    detected = detect_groups(groups, workers)
+    existing = set(db.scalars(select(Series.id)))
+    new_rows = [r for r in detected if r["id"] not in existing]
+    if new_rows:
+        db.execute(insert(Series), new_rows)
+        winners = {gid: w for _, _, games in groups for gid, _, w in games}
+        results = []
+        for r in new_rows:
+            teamA = (r["teamA_tag1"], r["teamA_tag2"])
+            teamB = (r["teamB_tag1"], r["teamB_tag2"])
+            results.append((teamA, teamB, [winners[g] for g in json.loads(r["game_ids"])], r["winner_team"]))
+        # counters summed in memory, one executemany per table
+        record_series_many(db, [(a, b, w) for a, b, _, w in results])
+        record_momentum_many(db, results)
+        link_series(db, [
+            (r["id"], json.loads(r["game_ids"])[0],
+             (r["teamA_tag1"], r["teamA_tag2"], r["teamB_tag1"], r["teamB_tag2"]), r["winner_team"])
+            for r in new_rows
+        ])
+        bump_generation(db)  # new series may all sort before the latest one
+    db.commit()
+    return len(new_rows)
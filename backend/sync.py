@@ -0,0 +1,55 @@
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from sqlalchemy.orm import Session
+from .config import FETCH_WORKERS
+from .groups import load_roster
+from .ingest import upsert_game, game_uid
+from .series import detect_series
+from .ratings import update_ratings
+from .form import update_form
+from .warm import build_snapshot
+
+# One sync pass for every group. Battle logs are fetched once per distinct tag
+# (a player in several groups costs one request) on a small thread pool, and
+# ingested on the calling thread as they arrive: SQLite has a single writer,
+# and each battle is classified into all of its groups in the same pass. A
+# battle appears in up to four members' logs; only its first copy is ingested.
+
+def sync(db: Session, since_hours: int = 6, workers: int = FETCH_WORKERS) -> int:
+    """Fetch, ingest, detect series and update ratings. Returns the number of new games."""
+    from .cr_client import _get_session, player_battlelog  # only the sync talks to the API
+
+    _get_session()  # fail fast on a missing CR_TOKEN instead of once per player
+    roster = load_roster(db)
+    tags = roster.tags()
+    seen: set[str] = set()
+    new_count = 0
+    with ThreadPoolExecutor(max_workers=max(workers, 1)) as pool:
+        futures = {pool.submit(player_battlelog, tag): tag for tag in tags}
+        for fut in as_completed(futures):
+            tag = futures[fut]
+            try:
+                log = fut.result() or []
+            except Exception as e:
+                print(f"fetch error {tag}: {e}")
+                continue
+            for b in log:
+                uid = game_uid(b)
+                if uid in seen:
+                    continue
+                seen.add(uid)
+                try:
+                    if upsert_game(db, b, roster=roster):
+                        new_count += 1
+                except Exception as e:
+                    print('ingest error:', e)
+            db.commit()
+    detect_series(db, since_hours=since_hours)
+    update_form(db)  # watermark no-op when nothing new
+    if new_count > 0:  # incremental; falls back to a full replay if needed
+        n = update_ratings(db)
+        print(f"Ratings updated. Inserted {n} history rows.")
+    n = build_snapshot(db)  # no-op if the snapshot already matches
+    if n:
+        print(f"Warm snapshot written: {n} entries.")
+    print(f"sync done: {len(tags)} players in {len(roster.clans)} groups, new games: {new_count}")
+    return new_count
@@ -0,0 +1,227 @@
+from __future__ import annotations
+from pathlib import Path
+import functools, hashlib, inspect, json, os, threading, time
+from sqlalchemy import select, func
+from sqlalchemy.orm import Session
+from .models import Game, Series, Player, Group, GroupMember, FormMeta, RatingModelMeta, DataGeneration, SchemaMigration
+from .counters import bump
+from .config import WARM_SNAPSHOT, VERSION_CHECK_SECONDS, WARM_CACHE_MAX
+
+# Warm state for the API: endpoint results (ratings, leaderboards, card stats,
+# form...) cached in memory per data version, and a serialized snapshot of them
+# on disk so a freshly started worker serves from memory right away.
+#
+# The data version is a fingerprint of the watermarks every writer moves (last
+# game and series, form and rating replay counters, group membership, player
+# names, schema version), plus a generation that rebuilds and re-linking bump
+# (they can leave the watermarks where they were), all read through indexes or
+# from small tables. A worker re-checks it at most once every
+# VERSION_CHECK_SECONDS; when it moves, the cache is dropped. Every re-check
+# also picks up the snapshot file if it changed and was built for the current
+# version (the sync writes one after every run).
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+
+def data_version(db: Session) -> str:
+    parts = (
+        db.execute(select(Game.battle_time, Game.id).order_by(Game.battle_time.desc(), Game.id.desc()).limit(1)).first(),
+        db.execute(
+            select(Series.ended_at, Series.started_at, Series.id)
+            .order_by(Series.ended_at.desc(), Series.started_at.desc(), Series.id.desc()).limit(1)
+        ).first(),
+        db.execute(select(FormMeta.games_count, FormMeta.series_count).where(FormMeta.id == 1)).first(),
+        db.execute(select(RatingModelMeta.model, RatingModelMeta.series_count, RatingModelMeta.predictions)).all(),
+        db.execute(select(Group.id, Group.slug, Group.clan_tag)).all(),
+        db.execute(select(GroupMember.group_id, GroupMember.player_tag)).all(),
+        db.execute(select(Player.tag, Player.name)).all(),  # renames show up in group/leaderboard responses
+        db.scalar(select(DataGeneration.generation).where(DataGeneration.id == 1)),
+        db.scalar(select(func.max(SchemaMigration.version))),
+    )
+    return hashlib.sha1(repr(parts).encode()).hexdigest()[:16]
+
+def bump_generation(db: Session):
+    """Move the data version for a change the watermarks miss (the caller commits)."""
+    bump(db, DataGeneration, {"id": 1}, {"generation": 1})
+
+
+def _loads(raw: bytes):
+    return orjson.loads(raw) if orjson is not None else json.loads(raw)
+
+def _dumps(obj) -> bytes:
+    from .web import dumps
+    return dumps(obj)
+
+
+class WarmCache:
+    """Endpoint results for one data version, plus load/save of the snapshot file."""
+
+    def __init__(self, path: str | None = WARM_SNAPSHOT, max_entries: int = WARM_CACHE_MAX):
+        self.path = Path(path) if path else None
+        self.max_entries = max_entries
+        self.version: str | None = None
+        self.entries: dict[str, object] = {}
+        self._checked = 0.0
+        self._file_seen = None  # (mtime, version) of the last look at the snapshot file
+        self._lock = threading.Lock()
+
+    def reset(self, version: str | None = None):
+        with self._lock:
+            self.version = version
+            self.entries = {}
+            self._checked = time.monotonic()
+
+    def current(self, db: Session) -> str:
+        """
+        The data version, re-read from the DB at most every VERSION_CHECK_SECONDS.
+        Each re-check also adopts the snapshot file if it changed and matches: the
+        sync writes it after its data, so it usually lands after the version moved.
+        """
+        now = time.monotonic()
+        if self.version is not None and now - self._checked < VERSION_CHECK_SECONDS:
+            return self.version
+        v = data_version(db)
+        with self._lock:
+            self._checked = now
+            if v != self.version:
+                self.version = v
+                self.entries = {}
+            self._load_file(v)
+        return v
+
+    def get(self, key: str, default=None):
+        return self.entries.get(key, default)
+
+    def put(self, key: str, value, version: str | None = None):
+        """Store a result computed at `version`; dropped if the version has moved on since."""
+        with self._lock:
+            if version is not None and version != self.version:
+                return
+            entries = self.entries
+            if key not in entries and len(entries) >= self.max_entries:
+                entries.pop(next(iter(entries)))  # oldest first
+            entries[key] = value
+
+    # ---- snapshot file ----
+    def _load_file(self, version: str) -> bool:
+        if self.path is None or not self.path.is_file():
+            return False
+        seen = (self.path.stat().st_mtime_ns, version)
+        if seen == self._file_seen:
+            return False  # already looked at this file for this version
+        self._file_seen = seen
+        try:
+            snap = _loads(self.path.read_bytes())
+        except (OSError, ValueError):
+            return False
+        if snap.get("version") != version:
+            return False
+        self.entries.update(snap.get("entries", {}))
+        return True
+
+    def load(self, db: Session) -> int:
+        """Check the DB version and adopt the snapshot if it matches. Returns entries loaded."""
+        self.reset()
+        self._file_seen = None
+        self.current(db)
+        return len(self.entries)
+
+    def save(self, db: Session | None = None) -> bool:
+        """
+        Write the current entries atomically (tmp file + rename). With `db`, the
+        version is re-checked first so a stale worker never overwrites a newer
+        snapshot with old results.
+        """
+        if db is not None:
+            self._checked = 0.0
+            self.current(db)
+        if self.path is None or self.version is None or not self.entries:
+            return False
+        with self._lock:
+            payload = _dumps({"version": self.version, "built_at": time.time(), "entries": self.entries})
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_name(f".{self.path.name}.{os.getpid()}.tmp")
+        tmp.write_bytes(payload)
+        os.replace(tmp, self.path)
+        self._file_seen = (self.path.stat().st_mtime_ns, self.version)
+        return True
+
+
+cache = WarmCache()
+
+_MISS = object()
+
+def cached(fn):
+    """
+    Cache an endpoint's result under its name and arguments (everything but
+    `db`) for the current data version. Keeps the signature for FastAPI, and
+    resolves Query(...) defaults so direct calls share the same keys.
+    """
+    sig = inspect.signature(fn)
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        bound = sig.bind(*args, **kwargs)
+        bound.apply_defaults()
+        params = bound.arguments
+        for k, v in params.items():
+            if k != "db" and hasattr(v, "default") and type(v).__module__.startswith("fastapi"):
+                params[k] = v.default
+        db = params["db"]
+        key = fn.__name__ + "?" + "&".join(f"{k}={params[k]}" for k in sorted(params) if k != "db")
+        version = cache.current(db)
+        hit = cache.get(key, _MISS)
+        if hit is not _MISS:
+            return hit
+        res = fn(**params)
+        cache.put(key, res, version)
+        return res
+
+    return wrapper
+
+
+def snapshot_version() -> str | None:
+    """Data version the snapshot file was built for (None if missing or unreadable)."""
+    if cache.path is None or not cache.path.is_file():
+        return None
+    try:
+        return _loads(cache.path.read_bytes()).get("version")
+    except (OSError, ValueError):
+        return None
+
+def build_snapshot(db: Session, force: bool = False) -> int:
+    """
+    Compute the hot endpoint results for every group and its members and write
+    the snapshot file. Called by the sync after each run; skipped when the file
+    already matches the data. Returns entries written.
+    """
+    if cache.path is None:
+        return 0
+    version = data_version(db)
+    if not force and snapshot_version() == version:
+        return 0
+    from . import api
+    from .groups import member_tags
+
+    cache.reset(version)
+    api.ratings_accuracy(db=db)
+    api.list_groups(db=db)
+    tags: set[str] = set()
+    for gid, slug in db.execute(select(Group.id, Group.slug)).all():
+        api.group_detail(slug, db=db)
+        api.last_update(group=slug, db=db)
+        api.series_leaderboard(group=slug, db=db)
+        api.elixir_stats(group=slug, db=db)
+        api.card_stats(group=slug, db=db)
+        api.group_form(group=slug, db=db)
+        api.duo_leaderboard(group=slug, db=db)
+        tags.update(member_tags(db, gid))
+    for tag in sorted(tags):
+        api.elo_history(tag, db=db)
+        api.player_summary(tag, db=db)
+        api.player_form(tag, db=db)
+    cache.save()
+    return len(cache.entries)
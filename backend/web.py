@@ -0,0 +1,232 @@
+from __future__ import annotations
+from datetime import date, datetime
+from pathlib import Path
+import asyncio, functools, gzip, hashlib, json, re
+from fastapi.routing import APIRoute
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.responses import JSONResponse, Response
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+# HTTP plumbing for the API: fast JSON rendering, response compression and
+# precompressed frontend assets. orjson and brotli are optional.
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional dependency
+    brotli = None
+
+
+def _default(o):
+    if isinstance(o, (datetime, date)):
+        return o.isoformat()
+    if isinstance(o, (set, frozenset)):
+        return list(o)
+    raise TypeError(f"Object of type {type(o).__name__} is not JSON serializable")
+
+def dumps(content) -> bytes:
+    """Serialize plain Python data (dicts, lists, datetimes) to compact JSON bytes."""
+    if orjson is not None:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(content, default=_default, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse rendered with orjson when installed (compact json.dumps otherwise)."""
+
+    def render(self, content) -> bytes:
+        return dumps(content)
+
+
+class FastJSONRoute(APIRoute):
+    """
+    Route class that wraps the endpoint so its return value goes straight into
+    FastJSONResponse, skipping FastAPI's jsonable_encoder pass. Endpoints that
+    return a Response (or declare a response_model) are left alone.
+    """
+
+    def get_route_handler(self):
+        call = self.dependant.call
+        if self.response_model is None and call is not None:
+            self.dependant.call = _wrap_endpoint(call)
+        return super().get_route_handler()
+
+def _wrap_endpoint(call):
+    if getattr(call, "_fast_json", False):
+        return call
+    if asyncio.iscoroutinefunction(call):
+        @functools.wraps(call)
+        async def endpoint(**values):
+            res = await call(**values)
+            return res if isinstance(res, Response) else FastJSONResponse(res)
+    else:
+        @functools.wraps(call)
+        def endpoint(**values):
+            res = call(**values)
+            return res if isinstance(res, Response) else FastJSONResponse(res)
+    endpoint._fast_json = True
+    return endpoint
+
+
+def _accepted(headers: Headers) -> str | None:
+    accept = headers.get("accept-encoding", "")
+    if brotli is not None and "br" in accept:
+        return "br"
+    if "gzip" in accept:
+        return "gzip"
+    return None
+
+# Media types worth compressing; images and other binaries are already dense
+def _compressible(content_type: str) -> bool:
+    ct = content_type.split(";", 1)[0].strip().lower()
+    return ct.startswith("text/") or ct in ("application/json", "application/javascript") or ct.endswith("+json")
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=5)
+    return gzip.compress(body, compresslevel=6)
+
+
+class CompressionMiddleware:
+    """
+    Compress complete responses of at least `minimum_size` bytes with brotli
+    (if installed and accepted) or gzip. Responses that already carry a
+    Content-Encoding (e.g. precompressed static assets) or are not text/JSON
+    (e.g. the favicon) pass through untouched.
+    """
+
+    def __init__(self, app: ASGIApp, minimum_size: int = 1024) -> None:
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = _accepted(Headers(scope=scope))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start: Message | None = None
+        chunks: list[bytes] = []
+        passthrough = False
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal start, passthrough
+            if message["type"] == "http.response.start":
+                start = message
+                h = Headers(raw=message["headers"])
+                passthrough = "content-encoding" in h or not _compressible(h.get("content-type", ""))
+                if passthrough:
+                    await send(message)
+                return
+            if message["type"] != "http.response.body" or passthrough:
+                await send(message)
+                return
+            chunks.append(message.get("body", b""))
+            if message.get("more_body", False):
+                return
+            body = b"".join(chunks)
+            headers = MutableHeaders(raw=start["headers"])
+            if len(body) >= self.minimum_size:
+                body = compress(body, encoding)
+                headers["Content-Encoding"] = encoding
+                headers["Content-Length"] = str(len(body))
+                headers.add_vary_header("Accept-Encoding")
+            await send(start)
+            await send({"type": "http.response.body", "body": body})
+
+        await self.app(scope, receive, send_wrapper)
+
+
+class PrefixMiddleware:
+    """
+    Also serve the app under `prefix` (e.g. /api/leaderboard/series), which is
+    where the bundled frontend calls it. The prefix is moved into root_path,
+    so routing sees the unprefixed path; requests without it are untouched,
+    and a proxy that strips the prefix itself still works.
+    """
+
+    def __init__(self, app: ASGIApp, prefix: str = "/api") -> None:
+        self.app = app
+        self.prefix = prefix.rstrip("/")
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if self.prefix and scope["type"] == "http":
+            root = scope.get("root_path", "") + self.prefix
+            path = scope["path"]
+            if path == root or path.startswith(root + "/"):
+                scope = dict(scope, root_path=root)
+        await self.app(scope, receive, send)
+
+
+_MEDIA_TYPES = {
+    ".html": "text/html; charset=utf-8",
+    ".json": "application/json",
+    ".ico": "image/x-icon",
+}
+LONG_CACHE = "public, max-age=31536000, immutable"
+
+
+class StaticAsset:
+    """One frontend file held in memory with its content hash and precompressed variants."""
+    __slots__ = ("name", "media_type", "etag", "version", "body", "encoded")
+
+    def __init__(self, name: str, body: bytes):
+        self.name = name
+        self.media_type = _MEDIA_TYPES.get(Path(name).suffix, "application/octet-stream")
+        self.body = body
+        digest = hashlib.sha256(body).hexdigest()
+        self.version = digest[:12]
+        self.etag = f'"{digest[:32]}"'
+        self.encoded: dict[str, bytes] = {}
+        if not name.endswith(".ico"):
+            self.encoded["gzip"] = gzip.compress(body, compresslevel=9)
+            if brotli is not None:
+                self.encoded["br"] = brotli.compress(body, quality=11)
+
+    def response(self, headers: Headers, versioned: bool) -> Response:
+        # index.html must always be revalidated; hashed asset URLs never change
+        cache = LONG_CACHE if versioned else "no-cache"
+        out = {"ETag": self.etag, "Cache-Control": cache, "Vary": "Accept-Encoding"}
+        if self.etag in headers.get("if-none-match", ""):
+            return Response(status_code=304, headers=out)
+        encoding = _accepted(headers)
+        if encoding in self.encoded:
+            out["Content-Encoding"] = encoding
+            return Response(self.encoded[encoding], media_type=self.media_type, headers=out)
+        return Response(self.body, media_type=self.media_type, headers=out)
+
+
+def load_assets(directory: str | Path) -> dict[str, StaticAsset]:
+    """
+    Read the frontend directory, hash and precompress every file. References to
+    the other assets inside index.html are rewritten to `name?v=<hash>` so they
+    can be cached for a year and still change on deploy.
+    """
+    root = Path(directory)
+    if not root.is_dir():
+        return {}
+    assets = {
+        p.name: StaticAsset(p.name, p.read_bytes())
+        for p in root.iterdir()
+        if p.is_file() and p.suffix in _MEDIA_TYPES
+    }
+    index = assets.get("index.html")
+    if index is not None:
+        html = index.body.decode("utf-8")
+        for name, a in assets.items():
+            if name == "index.html":
+                continue
+            html = re.sub(
+                rf'(["\'])(\./)?{re.escape(name)}\1',
+                lambda m, a=a: f"{m.group(1)}{m.group(2) or ''}{a.name}?v={a.version}{m.group(1)}",
+                html,
+            )
+        assets["index.html"] = StaticAsset("index.html", html.encode("utf-8"))
+    return assets
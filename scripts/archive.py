@@ -0,0 +1,146 @@
+# Raw battle archive maintenance.
+#
+#   python3 -m scripts.archive stats        # size / codec breakdown
+#   python3 -m scripts.archive train-dict   # train a zstd dictionary from archived payloads
+#   python3 -m scripts.archive reindex      # report segment records missing from the raw_battles index
+#   python3 -m scripts.archive reindex --adopt   # ...and index them (e.g. after restoring an older DB)
+#   python3 -m scripts.archive reprocess    # rebuild games, series, pairs, ratings, group links and form from the archive
+
+import argparse, sys
+from sqlalchemy import delete, func, insert, select
+from sqlalchemy.orm import Session
+from backend.db import SessionLocal
+from backend.migrations import init_db
+from backend.models import (
+    Game, GamePlayer, GamePlayerCard, Series, PairStat, DuoMatchup, GroupDuoStat,
+    RatingDelta, RatingState, RatingModelMeta, RawBattle, GameGroup, SeriesGroup,
+    FormState, MomentumStat, FormMeta, Group,
+)
+from backend.archive import get_archive, iter_battles, train_from_archive, archive_stats
+from backend.ingest import upsert_game, parse_time
+from backend.groups import load_roster
+from backend.series import recompute_series
+from backend.ratings import rebuild_ratings
+from backend.form import rebuild_form
+
+# Everything derived from battle payloads, children first
+DERIVED = (GamePlayerCard, GamePlayer, Game, GameGroup, Series, SeriesGroup, GroupDuoStat, PairStat, DuoMatchup,
+           RatingDelta, RatingState, RatingModelMeta, FormState, MomentumStat, FormMeta)
+
+def unarchived_games(db: Session) -> int:
+    """Stored games with no raw_battles record (ingested before the archive existed)."""
+    return db.scalar(
+        select(func.count()).select_from(Game)
+        .where(~select(RawBattle.uid).where(RawBattle.uid == Game.id).exists())
+    )
+
+def reprocess(db: Session, batch: int = 500) -> int:
+    """
+    Wipe derived tables and replay every archived battle through ingest, without
+    the API. Battles are classified against the current groups, so this also
+    applies membership and clan changes to the whole history.
+
+    Every table in DERIVED is rebuilt: game_groups by the classification in
+    upsert_game (the same rules as live ingest, clan checks included, which
+    backfill_group cannot apply), series_groups and momentum by
+    recompute_series, pair stats and group duo totals by ingest and series
+    detection (linking bumps them), and ratings
+    and form by full rebuilds (what update_ratings / update_form fall back to).
+
+    Refuses to run (ValueError) while any stored game has no archived payload:
+    the wipe would lose that history for good.
+    """
+    missing = unarchived_games(db)
+    if missing:
+        raise ValueError(
+            f"{missing} stored games have no raw_battles record and could not be rebuilt; "
+            "refusing to reprocess (run `reindex --adopt` if the segment files have them)."
+        )
+    for model in DERIVED:
+        db.execute(delete(model))
+    db.commit()
+
+    roster = load_roster(db)
+    new_count = 0
+    for i, b in enumerate(iter_battles(db), 1):
+        if upsert_game(db, b, roster=roster, archive=False):
+            new_count += 1
+            db.flush()  # the 5s duplicate check in upsert_game must see earlier games
+        if i % batch == 0:
+            db.commit()
+    db.commit()
+
+    recompute_series(db)
+    rebuild_ratings(db)
+    rebuild_form(db)
+    return new_count
+
+def link_counts(db: Session) -> list[tuple[str, int, int]]:
+    """(group slug, games linked, series linked) for every group."""
+    games = dict(db.execute(select(GameGroup.group_id, func.count()).group_by(GameGroup.group_id)).all())
+    series = dict(db.execute(select(SeriesGroup.group_id, func.count()).group_by(SeriesGroup.group_id)).all())
+    return [(slug, games.get(gid, 0), series.get(gid, 0))
+            for gid, slug in db.execute(select(Group.id, Group.slug).order_by(Group.slug))]
+
+def reindex(db: Session, adopt: bool = False) -> tuple[int, int]:
+    """
+    Find records present in segment files but missing from raw_battles. Those
+    are orphans of a rolled-back or interrupted ingest (or of an index lost with
+    an older database backup); they are only indexed with adopt=True, first
+    copy of each battle. Returns (orphans found, records indexed).
+    """
+    arc = get_archive()
+    known = set(db.scalars(select(RawBattle.uid)))
+    orphans: set[str] = set()
+    added = 0
+    for path in sorted(arc.dir.glob("seg-*.bin")):
+        seg = int(path.stem.split("-")[1])
+        for uid, rec in arc.scan_segment(seg):
+            if uid in known:
+                continue
+            orphans.add(uid)
+            if not adopt:
+                continue
+            b = arc.read(**rec)
+            db.execute(insert(RawBattle).values(
+                uid=uid, battle_time=parse_time(b["battleTime"]).replace(tzinfo=None), **rec,
+            ))
+            known.add(uid)
+            added += 1
+    db.commit()
+    return len(orphans), added
+
+def main():
+    ap = argparse.ArgumentParser(description="Raw battle archive maintenance.")
+    ap.add_argument("command", choices=["stats", "train-dict", "reindex", "reprocess"])
+    ap.add_argument("--adopt", action="store_true", help="reindex: also index orphaned records")
+    args = ap.parse_args()
+
+    init_db()
+    db: Session = SessionLocal()
+    try:
+        if args.command == "stats":
+            for k, v in archive_stats(db).items():
+                print(f"{k:>18}: {v}")
+        elif args.command == "train-dict":
+            n = train_from_archive(db)
+            print(f"Trained zstd dictionary #{n}; new records will use it.")
+        elif args.command == "reindex":
+            orphans, added = reindex(db, adopt=args.adopt)
+            print(f"Orphaned records (not in raw_battles): {orphans}. Indexed: {added}.")
+            if orphans and not args.adopt:
+                print("Left unindexed; rerun with --adopt to index them.")
+        elif args.command == "reprocess":
+            try:
+                n = reprocess(db)
+            except ValueError as e:
+                sys.exit(str(e))
+            print(f"Reprocessed archive. Games ingested: {n}.")
+            for slug, games, series in link_counts(db):
+                print(f"  {slug:<20} {games:>7} games {series:>6} series")
+            print(f"  form rows: {db.scalar(select(func.count()).select_from(FormState))}")
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,196 @@
+# Micro-benchmarks for the API and maintenance paths.
+#
+#   python3 -m scripts.bench serialization   # JSON encode time + payload bytes, before/after
+#   python3 -m scripts.bench recompute --workers 1,2,4   # full-history Bo7 detection vs. cores
+#   python3 -m scripts.bench coldstart       # API import/startup/first-request time, with and without the warm snapshot
+
+import argparse, json, os, random, subprocess, sys, time
+from datetime import datetime, timedelta
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from backend import web
+from backend.config import FRONTEND_DIR
+from backend.db import SessionLocal
+
+
+def _timeit(fn, repeat: int = 5, number: int = 200) -> float:
+    """Best-of-`repeat` mean time per call in microseconds."""
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        for _ in range(number):
+            fn()
+        best = min(best, (time.perf_counter() - t0) / number)
+    return best * 1e6
+
+# Payloads shaped like the real endpoint results
+def _payloads() -> dict:
+    rnd = random.Random(7)
+    t0 = datetime(2025, 1, 1)
+    cards = [
+        {"card_id": 26000000 + i, "uses": rnd.randint(50, 900), "wins": rnd.randint(20, 450),
+         "losses": rnd.randint(20, 450), "win_pct": round(rnd.random(), 4)}
+        for i in range(120)
+    ]
+    history = {
+        "player_tag": "#PUCC2V8Q", "model": "elo",
+        "history": [
+            {"timestamp": (t0 + timedelta(hours=i)).isoformat() + "Z", "elo": 400 + rnd.randint(-80, 80)}
+            for i in range(2000)
+        ],
+    }
+    rivals = {
+        "player_tag": "#PUCC2V8Q",
+        "rivals": [
+            {"player_tag": f"#TAG{i}", "games_against": 40, "games_won": 22, "game_win_pct": 0.55,
+             "series_against": 6, "series_won": 4, "series_win_pct": 0.6667}
+            for i in range(40)
+        ],
+    }
+    last_update = {"last_battle_time": t0}
+    return {"/stats/cards": cards, "/players/{tag}/elo-history": history,
+            "/players/{tag}/rivals": rivals, "/last-update": last_update}
+
+def bench_serialization():
+    default = JSONResponse(None)
+    fast = web.FastJSONResponse(None)
+    print(f"JSON backend: {'orjson' if web.orjson else 'json (stdlib)'}; "
+          f"brotli: {'yes' if web.brotli else 'no'}\n")
+    print(f"{'endpoint':<28}{'default us':>12}{'fast us':>10}{'speedup':>9}"
+          f"{'bytes':>9}{'fast':>9}{'gzip':>8}{'br':>8}")
+    for name, payload in _payloads().items():
+        before = lambda: default.render(jsonable_encoder(payload))
+        after = lambda: fast.render(payload)
+        t_before, t_after = _timeit(before), _timeit(after)
+        b_before, b_after = len(before()), len(after())
+        gz = len(web.compress(after(), "gzip"))
+        br = len(web.compress(after(), "br")) if web.brotli else 0
+        print(f"{name:<28}{t_before:>12.1f}{t_after:>10.1f}{t_before / t_after:>8.1f}x"
+              f"{b_before:>9}{b_after:>9}{gz:>8}{br or '-':>8}")
+
+    print(f"\n{'asset':<28}{'bytes':>9}{'gzip':>9}{'br':>9}")
+    for name, asset in sorted(web.load_assets(FRONTEND_DIR).items()):
+        gz = len(asset.encoded.get("gzip", b"")) or "-"
+        br = len(asset.encoded.get("br", b"")) or "-"
+        print(f"{name:<28}{len(asset.body):>9}{gz:>9}{br:>9}")
+
+
+def bench_recompute(workers: list[int]):
+    from backend.series import _load_groups, detect_groups
+    db = SessionLocal()
+    try:
+        t0 = time.perf_counter()
+        groups = _load_groups(db)
+        load_s = time.perf_counter() - t0
+    finally:
+        db.close()
+    n_games = sum(len(g[2]) for g in groups)
+    print(f"{n_games} games in {len(groups)} pairings, tuple load {load_s * 1000:.0f} ms\n")
+    print(f"{'workers':>8}{'detect ms':>12}{'series':>9}{'speedup':>9}")
+    base = None
+    for w in workers:
+        t0 = time.perf_counter()
+        rows = detect_groups(groups, workers=w, min_games=0)
+        elapsed = time.perf_counter() - t0
+        base = base or elapsed
+        print(f"{w:>8}{elapsed * 1000:>12.0f}{len(rows):>9}{base / elapsed:>8.1f}x")
+
+
+# Runs in a fresh interpreter: import the app, run its lifespan startup and
+# time the first and second request to each path (plain ASGI calls, no server).
+_COLDSTART_CHILD = r"""
+import asyncio, json, sys, time
+t0 = time.perf_counter()
+import backend.api as api
+t_import = time.perf_counter() - t0
+
+async def get(path):
+    body = []
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+    async def send(msg):
+        if msg["type"] == "http.response.body":
+            body.append(msg.get("body", b""))
+    path, _, qs = path.partition("?")
+    scope = {"type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+             "scheme": "http", "path": path, "raw_path": path.encode(), "query_string": qs.encode(),
+             "headers": [], "client": ("127.0.0.1", 1), "server": ("127.0.0.1", 80), "root_path": ""}
+    await api.app(scope, receive, send)
+    return sum(map(len, body))
+
+async def main(paths):
+    # lifespan over the ASGI protocol, as a server drives it
+    inbox, outbox = asyncio.Queue(), asyncio.Queue()
+    out = {"import_ms": t_import * 1000, "requests": []}
+    t0 = time.perf_counter()
+    task = asyncio.create_task(api.app({"type": "lifespan", "asgi": {"version": "3.0"}}, inbox.get, outbox.put))
+    await inbox.put({"type": "lifespan.startup"})
+    assert (await outbox.get())["type"] == "lifespan.startup.complete"
+    out["startup_ms"] = (time.perf_counter() - t0) * 1000
+    out["warm_entries"] = len(api.warm_cache.entries)
+    for p in paths:
+        t1 = time.perf_counter(); await get(p); first = time.perf_counter() - t1
+        t1 = time.perf_counter(); await get(p); second = time.perf_counter() - t1
+        out["requests"].append([p, first * 1000, second * 1000])
+    out["ready_ms"] = (time.perf_counter() - t0) * 1000 + out["import_ms"]
+    await inbox.put({"type": "lifespan.shutdown"})
+    await outbox.get()
+    await task
+    print(json.dumps(out))
+
+asyncio.run(main(sys.argv[1:]))
+"""
+
+def _coldstart_run(paths: list[str], snapshot: str) -> dict:
+    env = dict(os.environ, WARM_SNAPSHOT=snapshot)
+    out = subprocess.run([sys.executable, "-c", _COLDSTART_CHILD, *paths],
+                         env=env, capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+def bench_coldstart(paths: list[str], runs: int):
+    from backend.config import WARM_SNAPSHOT
+    from backend.migrations import init_db
+    from backend.warm import build_snapshot
+
+    if not WARM_SNAPSHOT:
+        raise SystemExit("WARM_SNAPSHOT is empty; set it to a path to compare against the snapshot.")
+    init_db()
+    db = SessionLocal()
+    try:
+        t0 = time.perf_counter()
+        n = build_snapshot(db, force=True)
+        print(f"snapshot: {n} entries, {os.path.getsize(WARM_SNAPSHOT)} bytes, "
+              f"built in {(time.perf_counter() - t0) * 1000:.0f} ms\n")
+    finally:
+        db.close()
+
+    for label, snap in (("no snapshot", ""), ("snapshot", WARM_SNAPSHOT)):
+        # best of `runs` fresh processes (first run also warms the OS file cache)
+        res = min((_coldstart_run(paths, snap) for _ in range(runs)), key=lambda r: r["ready_ms"])
+        print(f"{label}: import {res['import_ms']:.0f} ms, startup {res['startup_ms']:.0f} ms "
+              f"({res['warm_entries']} warm entries), time to last first response {res['ready_ms']:.0f} ms")
+        print(f"  {'path':<36}{'first ms':>10}{'second ms':>11}")
+        for p, first, second in res["requests"]:
+            print(f"  {p:<36}{first:>10.2f}{second:>11.2f}")
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__)
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    sub.add_parser("serialization", help="JSON encode time and payload bytes, default vs fast path")
+    rc = sub.add_parser("recompute", help="full-history series detection time per worker count")
+    rc.add_argument("--workers", default="1,2,4", help="comma-separated worker counts")
+    cs = sub.add_parser("coldstart", help="time to first request of a fresh API process, with/without the warm snapshot")
+    cs.add_argument("--paths", default="/leaderboard/series,/stats/cards,/stats/elixir,/ratings/accuracy,/form",
+                    help="comma-separated request paths, timed in order")
+    cs.add_argument("--runs", type=int, default=3, help="fresh processes per mode (best is reported)")
+    args = ap.parse_args()
+    if args.cmd == "serialization":
+        bench_serialization()
+    elif args.cmd == "recompute":
+        bench_recompute([int(w) for w in args.workers.split(",")])
+    elif args.cmd == "coldstart":
+        bench_coldstart(args.paths.split(","), args.runs)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,216 @@
+# Query-plan regression check.
+#
+# Builds a synthetic large SQLite database, runs every endpoint and the ingest /
+# series / rating paths against it while capturing the SQL they emit, and
+# asserts that EXPLAIN QUERY PLAN uses an index for each SELECT/UPDATE (no
+# plain "SCAN <table>"). Exits non-zero on any regression. The same cases run
+# under pytest (tests/test_query_plans.py) on a smaller database.
+#
+#   python3 -m scripts.check_query_plans [--games 20000] [-v]
+
+import argparse, os, random, sys, tempfile
+from datetime import datetime, timedelta
+
+# Hermetic settings; must be set before backend.config is imported
+_tmp = tempfile.mkdtemp(prefix="cr-plans-")
+_TAGS = [f"#CHK{i:02d}" for i in range(24)]
+os.environ.update({
+    "DATABASE_URL": f"sqlite:///{_tmp}/plans.db",
+    "ARCHIVE_DIR": f"{_tmp}/archive",
+    "PLAYER_TAGS": ",".join(_TAGS),
+    "PLAYER_NAMES": ",".join(t.lstrip("#") for t in _TAGS),
+    "CLAN_TAG": "#CHECK",
+    # no snapshot and one version check (the first case): each endpoint below runs
+    # exactly its own queries
+    "WARM_SNAPSHOT": "",
+    "VERSION_CHECK_SECONDS": "1e9",
+})
+
+from sqlalchemy import event, insert, text
+from backend import api
+from backend.config import TOUCHDOWN_DRAFT_MODE_ID
+from backend.db import engine, SessionLocal
+from backend.ingest import upsert_game
+from backend.migrations import init_db
+from backend.models import Game, GamePlayer, GamePlayerCard
+from backend.groups import DEFAULT_GROUP, backfill_group, get_group, load_roster
+from backend.form import rebuild_form, update_form
+from backend.pairs import rebuild_pairs
+from backend.ratings import rebuild_ratings, update_ratings
+from backend.series import recompute_series, detect_series
+from backend.warm import cache as warm_cache
+
+# Tiny bookkeeping tables whose full scans are fine; rosters are read whole by design
+SMALL_TABLES = {"rating_model_meta", "schema_migrations", "players", "groups", "group_members"}
+
+# Full index scans that are intended, by case. The data version reads the latest
+# game and series backwards off their order indexes (LIMIT 1). The elixir
+# aggregate covers every game of the group; here the one group holds them all,
+# so on a large database SQLite rightly reads the covering per-player index once
+# instead of probing it per game. Anything else reading a whole index is a
+# regression.
+ALLOWED_INDEX_SCANS = {
+    "warm.data_version": {
+        "SCAN games USING COVERING INDEX ix_games_order",
+        "SCAN series USING COVERING INDEX ix_series_order",
+    },
+    "GET /stats/elixir": {
+        "SCAN game_players USING COVERING INDEX ix_game_players_player",
+    },
+}
+
+
+def populate(n_games: int):
+    rnd = random.Random(42)
+    now = datetime.utcnow()
+    t = now - timedelta(minutes=7 * n_games)
+    games, gps, cards = [], [], []
+    gid = 0
+    while gid < n_games:
+        a1, a2, b1, b2 = rnd.sample(_TAGS, 4)
+        (a1, a2), (b1, b2) = sorted([tuple(sorted((a1, a2))), tuple(sorted((b1, b2)))])
+        for _ in range(rnd.randint(4, 9)):
+            t += timedelta(minutes=rnd.randint(3, 9))
+            w = rnd.choice("AAB" if gid % 2 else "ABB")
+            games.append({
+                "id": f"g{gid:08d}", "battle_time": t, "type": "clanMate2v2", "mode_id": TOUCHDOWN_DRAFT_MODE_ID,
+                "event_tag": None, "teamA_tag1": a1, "teamA_tag2": a2, "teamB_tag1": b1, "teamB_tag2": b2,
+                "teamA_crowns": int(w == "A"), "teamB_crowns": int(w == "B"), "winner_team": w, "season_id": None,
+            })
+            for tag, team in ((a1, "A"), (a2, "A"), (b1, "B"), (b2, "B")):
+                gps.append({"game_id": f"g{gid:08d}", "player_tag": tag, "team": team,
+                            "crowns": 0, "elixir_leaked": rnd.random() * 4})
+                for c in rnd.sample(range(120), 8):
+                    cards.append({"game_id": f"g{gid:08d}", "player_tag": tag, "card_id": 26000000 + c})
+            gid += 1
+        t += timedelta(minutes=45)
+
+    init_db()  # creates the default group and its players from PLAYER_TAGS
+    with engine.begin() as conn:
+        conn.execute(insert(Game), games)
+        conn.execute(insert(GamePlayer), gps)
+        conn.execute(insert(GamePlayerCard), cards)
+    db = SessionLocal()
+    try:
+        group = get_group(db, DEFAULT_GROUP)
+        backfill_group(db, group)
+        db.commit()
+        recompute_series(db, workers=1)
+        rebuild_pairs(db)
+        rebuild_ratings(db)
+        rebuild_form(db)
+    finally:
+        db.close()
+    with engine.begin() as conn:
+        conn.execute(text("ANALYZE"))
+    return games[-1]
+
+
+def _battle(last_game: dict) -> dict:
+    """A brand-new battle between the last pairing, shaped like the API payload."""
+    bt = last_game["battle_time"] + timedelta(minutes=5)
+    def p(tag, crowns):
+        return {"tag": tag, "crowns": crowns, "elixirLeaked": 1.5, "clan": {"tag": "#CHECK"},
+                "cards": [{"id": 26000000 + i} for i in range(8)]}
+    return {
+        "type": "clanMate2v2", "battleTime": bt.strftime("%Y%m%dT%H%M%S.000Z"),
+        "gameMode": {"id": TOUCHDOWN_DRAFT_MODE_ID},
+        "team": [p(last_game["teamA_tag1"], 1), p(last_game["teamA_tag2"], 1)],
+        "opponent": [p(last_game["teamB_tag1"], 0), p(last_game["teamB_tag2"], 0)],
+    }
+
+
+def cases(last_game: dict):
+    """(name, callable(db)) for every path we care about."""
+    tag = last_game["teamA_tag1"]
+    mate = last_game["teamA_tag2"]
+    return [
+        ("warm.data_version", lambda db: warm_cache.current(db)),
+        ("GET /groups", lambda db: api.list_groups(db=db)),
+        ("GET /groups/{slug}", lambda db: api.group_detail(DEFAULT_GROUP, db=db)),
+        ("GET /last-update", lambda db: api.last_update(DEFAULT_GROUP, db=db)),
+        ("GET /leaderboard/series", lambda db: api.series_leaderboard(DEFAULT_GROUP, db=db)),
+        ("GET /players/{tag}/elo-history", lambda db: api.elo_history(tag, model="elo", db=db)),
+        ("GET /players/{tag}/elo-history?model=glicko2", lambda db: api.elo_history(tag, model="glicko2", db=db)),
+        ("GET /ratings/accuracy", lambda db: api.ratings_accuracy(db=db)),
+        ("GET /stats/elixir", lambda db: api.elixir_stats(DEFAULT_GROUP, db=db)),
+        ("GET /stats/cards", lambda db: api.card_stats(DEFAULT_GROUP, db=db)),
+        ("GET /stats/cards/head-to-head", lambda db: api.card_head_to_head_games(26000001, 26000002, DEFAULT_GROUP, db=db)),
+        ("GET /players/{tag}/summary", lambda db: api.player_summary(tag, db=db)),
+        ("GET /players/{tag}/teammates", lambda db: api.player_teammates(tag, db=db)),
+        ("GET /players/{tag}/rivals", lambda db: api.player_rivals(tag, db=db)),
+        ("GET /players/{tag}/form", lambda db: api.player_form(tag, last=10, db=db)),
+        ("GET /form", lambda db: api.group_form(last=10, group=DEFAULT_GROUP, db=db)),
+        ("GET /duos/leaderboard", lambda db: api.duo_leaderboard(min_series=1, limit=50, group=DEFAULT_GROUP, db=db)),
+        ("GET /duos/{tag1}/{tag2}/matchups", lambda db: api.duo_matchups(tag, mate, db=db)),
+        ("ingest.upsert_game", lambda db: upsert_game(db, _battle(last_game), load_roster(db))),
+        ("series.detect_series(6h)", lambda db: detect_series(db, since_hours=6)),
+        ("ratings.update_ratings", lambda db: update_ratings(db)),
+        ("form.update_form", lambda db: update_form(db)),
+    ]
+
+
+def _bad_lines(plan: list[str], allowed: set[str] = frozenset()) -> list[str]:
+    bad = []
+    for detail in plan:
+        if not detail.startswith("SCAN "):
+            continue
+        table = detail.split()[1]
+        if table in SMALL_TABLES or table.startswith("(") or detail in allowed:
+            continue
+        bad.append(detail)
+    return bad
+
+def explain_case(fn) -> list[tuple[str, list[str]]]:
+    """Run fn(db) in a rolled-back session; (sql, plan lines) for every SELECT/UPDATE it sent."""
+    captured: list[tuple[str, object]] = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        head = statement.lstrip().split(None, 1)[0].upper()
+        if head in ("SELECT", "UPDATE", "WITH") and not executemany:
+            captured.append((statement, parameters))
+
+    db = SessionLocal()
+    try:
+        event.listen(engine, "before_cursor_execute", capture)
+        try:
+            fn(db)
+        finally:
+            event.remove(engine, "before_cursor_execute", capture)
+            db.rollback()
+        conn = db.connection()
+        return [
+            (sql, [row[-1] for row in conn.exec_driver_sql("EXPLAIN QUERY PLAN " + sql, params)])
+            for sql, params in captured
+        ]
+    finally:
+        db.rollback()
+        db.close()
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Assert every endpoint query uses an index.")
+    ap.add_argument("--games", type=int, default=20000)
+    ap.add_argument("-v", "--verbose", action="store_true", help="print every plan")
+    args = ap.parse_args()
+
+    last_game = populate(args.games)
+    failures = 0
+    for name, fn in cases(last_game):
+        allowed = ALLOWED_INDEX_SCANS.get(name, set())
+        results = [(sql, plan, _bad_lines(plan, allowed)) for sql, plan in explain_case(fn)]
+
+        bad_queries = sum(1 for _, _, bad in results if bad)
+        failures += bad_queries
+        print(f"{'FAIL' if bad_queries else 'ok  '} {name} ({len(results)} queries)")
+        for sql, plan, bad in results:
+            if bad or args.verbose:
+                print(f"       {' '.join(sql.split())[:160]}")
+                for line in plan:
+                    print(f"       {'!!' if line in bad else '  '} {line}")
+
+    print(f"\n{failures} query plan regression(s)" if failures else "\nAll endpoint queries use indexes.")
+    sys.exit(1 if failures else 0)
+
+if __name__ == "__main__":
+    main()
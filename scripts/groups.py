@@ -0,0 +1,83 @@
+# Manage tracked groups (rosters).
+#
+#   python3 -m scripts.groups list
+#   python3 -m scripts.groups create <slug> [--name NAME] [--clan #CLANTAG]
+#   python3 -m scripts.groups add <slug> '#TAG1=Name1' '#TAG2' ...
+#   python3 -m scripts.groups remove <slug> '#TAG1' ...
+#   python3 -m scripts.groups backfill <slug>   # link already-stored games/series to the group
+#   python3 -m scripts.groups delete <slug>
+#
+# The "default" group mirrors PLAYER_TAGS / CLAN_TAG from the environment and
+# is re-synced on every start; manage other groups here.
+
+import argparse, sys
+from sqlalchemy import select, func
+from sqlalchemy.orm import Session
+from backend.db import SessionLocal
+from backend.migrations import init_db
+from backend.models import Group, GroupMember
+from backend.groups import (
+    DEFAULT_GROUP, backfill_group, create_group, delete_group, get_group, remove_members, set_members,
+)
+
+def _parse_players(items: list[str]) -> dict[str, str | None]:
+    out = {}
+    for item in items:
+        tag, _, name = item.partition("=")
+        out[tag.strip().upper()] = name.strip() or None
+    return out
+
+def main():
+    ap = argparse.ArgumentParser(description="Manage tracked groups.")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    sub.add_parser("list")
+    c = sub.add_parser("create")
+    c.add_argument("slug")
+    c.add_argument("--name")
+    c.add_argument("--clan", help="only battles where all four players are in this clan count")
+    for name in ("add", "remove"):
+        p = sub.add_parser(name)
+        p.add_argument("slug")
+        p.add_argument("players", nargs="+", help="#TAG or #TAG=Name")
+    for name in ("backfill", "delete"):
+        sub.add_parser(name).add_argument("slug")
+    args = ap.parse_args()
+
+    init_db()
+    db: Session = SessionLocal()
+    try:
+        if args.cmd == "list":
+            counts = dict(db.execute(select(GroupMember.group_id, func.count()).group_by(GroupMember.group_id)).all())
+            for g in db.scalars(select(Group).order_by(Group.slug)):
+                print(f"{g.slug:<20} {counts.get(g.id, 0):>4} members  clan={g.clan_tag or '-'}  {g.name}")
+            return
+        if args.cmd == "create":
+            if get_group(db, args.slug):
+                sys.exit(f"Group {args.slug!r} already exists.")
+            create_group(db, args.slug, args.name, args.clan)
+            db.commit()
+            print(f"Created group {args.slug!r}.")
+            return
+
+        group = get_group(db, args.slug)
+        if group is None:
+            sys.exit(f"Unknown group {args.slug!r}.")
+        if group.slug == DEFAULT_GROUP and args.cmd in ("add", "remove", "delete"):
+            print("Note: the default group is re-synced from PLAYER_TAGS on the next start.")
+        if args.cmd == "add":
+            added, _ = set_members(db, group, _parse_players(args.players))
+            print(f"Added {added} members. Run `backfill {group.slug}` to link games already stored.")
+        elif args.cmd == "remove":
+            print(f"Removed {remove_members(db, group, args.players)} members.")
+        elif args.cmd == "backfill":
+            games, series = backfill_group(db, group)
+            print(f"Linked {games} games and {series} series.")
+        elif args.cmd == "delete":
+            delete_group(db, group)
+            print(f"Deleted group {args.slug!r}.")
+        db.commit()
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    main()
@@ -1,16 +1,21 @@
 # Recompute series for all games ingested (not just recent ones in last 6 hours)
 
+import argparse
 from sqlalchemy.orm import Session
 from backend.db import SessionLocal
-from backend.series import detect_series
+from backend.series import recompute_series
 
 def main():
+    ap = argparse.ArgumentParser(description="Recompute series across all games.")
+    ap.add_argument("--workers", type=int, default=None,
+                    help="worker processes for Bo7 detection (default: CPU count, 1 = serial)")
+    args = ap.parse_args()
     db: Session = SessionLocal()
     try:
-        detect_series(db, since_hours=None)
-        print('Recomputed series across all games.')
+        n = recompute_series(db, workers=args.workers)
+        print(f'Recomputed series across all games. New series: {n}.')
     finally:
         db.close()
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    main()
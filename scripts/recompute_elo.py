@@ -1,13 +1,17 @@
 from sqlalchemy.orm import Session
-from backend.db import SessionLocal, Base, engine
-from backend.elo import rebuild_elo
+from backend.db import SessionLocal
+from backend.migrations import init_db
+from backend.ratings import rebuild_ratings, model_accuracy
 
 def main():
-    Base.metadata.create_all(bind=engine)  # ensure table exists
+    init_db()  # ensure tables exist and are migrated
     db: Session = SessionLocal()
     try:
-        n = rebuild_elo(db)
-        print(f"ELO rebuild done. Inserted {n} rows.")
+        n = rebuild_ratings(db)
+        print(f"Rating rebuild done. Inserted {n} rows.")
+        for m in model_accuracy(db):
+            print(f"  {m['model']:<10} accuracy={m['accuracy']:.4f} brier={m['brier']:.4f} "
+                  f"log_loss={m['log_loss']:.4f} over {m['predictions']} series")
     finally:
         db.close()
 
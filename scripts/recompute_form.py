@@ -0,0 +1,16 @@
+from sqlalchemy.orm import Session
+from backend.db import SessionLocal
+from backend.migrations import init_db
+from backend.form import rebuild_form
+
+def main():
+    init_db()  # ensure tables exist and are migrated
+    db: Session = SessionLocal()
+    try:
+        n = rebuild_form(db)
+        print(f"Form rebuild done. Wrote {n} player/duo rows.")
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,19 @@
+from sqlalchemy.orm import Session
+from backend.db import SessionLocal
+from backend.migrations import init_db
+from backend.pairs import rebuild_pairs
+from backend.groups import rebuild_group_duos
+
+def main():
+    init_db()  # ensure tables exist and are migrated
+    db: Session = SessionLocal()
+    try:
+        n = rebuild_pairs(db)
+        print(f"Pair stats rebuild done. Wrote {n} rows.")
+        n = rebuild_group_duos(db)
+        print(f"Group duo stats rebuild done. Wrote {n} rows.")
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    main()
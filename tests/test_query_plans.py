@@ -0,0 +1,58 @@
+# Query-plan regression tests over a small synthetic database; see
+# scripts/check_query_plans.py (run it with -v to dump every plan).
+
+import pytest
+
+from scripts import check_query_plans as qp  # sets the hermetic env before backend is imported
+from backend.db import SessionLocal
+from backend.warm import cache as warm_cache
+
+
+@pytest.fixture(scope="module")
+def last_game():
+    return qp.populate(3000)
+
+
+def _plans(fn) -> list[str]:
+    # fresh warm cache with the version already checked, so fn runs only its own queries
+    warm_cache.reset()
+    with SessionLocal() as db:
+        warm_cache.current(db)
+    return [line for _, plan in qp.explain_case(fn) for line in plan]
+
+
+def test_every_case_uses_indexes(last_game):
+    warm_cache.reset()
+    failures = {}
+    for name, fn in qp.cases(last_game):
+        allowed = qp.ALLOWED_INDEX_SCANS.get(name, set())
+        bad = [line for _, plan in qp.explain_case(fn) for line in qp._bad_lines(plan, allowed)]
+        if bad:
+            failures[name] = bad
+    assert failures == {}
+
+
+def test_data_version_index_scans(last_game):
+    # latest game and series, LIMIT 1 off the order indexes; the elixir allowance
+    # only kicks in on databases larger than this one
+    assert set(qp.ALLOWED_INDEX_SCANS) == {"warm.data_version", "GET /stats/elixir"}
+    warm_cache.reset()
+    lines = [line for _, plan in qp.explain_case(lambda db: warm_cache.current(db)) for line in plan]
+    scans = {line for line in lines if line.startswith("SCAN ") and line.split()[1] not in qp.SMALL_TABLES}
+    assert scans == qp.ALLOWED_INDEX_SCANS["warm.data_version"]
+
+
+def test_card_stats_reads_only_the_group(last_game):
+    # per group since the game_groups join: no whole-table or whole-index scan left
+    fn = dict(qp.cases(last_game))["GET /stats/cards"]
+    lines = _plans(fn)
+    assert lines
+    assert [line for line in lines if line.startswith("SCAN ") and line.split()[1] not in qp.SMALL_TABLES] == []
+    assert any(line.startswith("SEARCH game_groups") for line in lines)
+
+
+def test_elixir_stats_probes_the_group_at_this_size(last_game):
+    # the game_players scan allowed for it is a large-database plan only
+    fn = dict(qp.cases(last_game))["GET /stats/elixir"]
+    lines = _plans(fn)
+    assert not any(line.startswith("SCAN game_players") for line in lines)